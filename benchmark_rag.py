@@ -0,0 +1,553 @@
+# benchmark_rag.py
+"""Offline latency/throughput benchmark for the RAG path, using local stand-ins for Azure services.
+
+    python benchmark_rag.py                                   # defaults, results in benchmark_results.json
+    python benchmark_rag.py --iterations 100 --concurrency 1,4,16 --llm-ttft-ms 500
+    python benchmark_rag.py --failure-rate 0.05 --rate-limit-rate 0.1 --output before.json
+    python benchmark_rag.py --scenarios docx_extraction           # DOCX parsers only
+
+The corpus is the documents in assets/ (DOCX files and pre-computed layout JSON), ingested through
+the same code as index_pipeline.py. Fake embeddings, search and chat clients add configurable
+latency and inject failures/429s, so changes to chunking, caching or concurrency can be compared
+run against run without any network access.
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import platform
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+BENCHMARK_QUESTIONS = [
+    "What is the bid submission deadline?",
+    "Summarize the purpose of the tender.",
+    "List all mandatory returnable documents.",
+    "What are the B-BBEE requirements?",
+    "What technical requirements must the ITSM system meet?",
+    "Who should enquiries be addressed to?",
+    "What is the contract duration?",
+    "How will proposals be evaluated?",
+    "What insurance or bonding is required?",
+    "What are the requirements in RFB 3059-2024?",
+]
+
+
+# --- Timing helpers ---
+class StageTimings:
+    """Thread-safe collection of per-call durations, by stage name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = {}
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._durations.setdefault(stage, []).append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {stage: summarize(values) for stage, values in self._durations.items()}
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(values: list) -> dict:
+    ordered = sorted(values)
+    return {"count": len(ordered), "mean_ms": round(1000 * sum(ordered) / len(ordered), 3) if ordered else 0.0,
+            "p50_ms": round(1000 * percentile(ordered, 50), 3), "p95_ms": round(1000 * percentile(ordered, 95), 3),
+            "p99_ms": round(1000 * percentile(ordered, 99), 3), "max_ms": round(1000 * ordered[-1], 3) if ordered else 0.0}
+
+
+class FaultInjector:
+    """Sleeps for the configured latency (+/- jitter) and raises injected failures."""
+
+    def __init__(self, latency_ms: float, jitter: float, failure_rate: float, rate_limit_rate: float, seed: int):
+        self.latency_s = latency_ms / 1000.0
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, latency_s: float = None):
+        with self._lock:
+            roll = self._random.random()
+            spread = 1 + self.jitter * (2 * self._random.random() - 1)
+        time.sleep(max(0.0, (self.latency_s if latency_s is None else latency_s) * spread))
+        if roll < self.rate_limit_rate:
+            raise FakeRateLimitError("429 Too Many Requests (injected)")
+        if roll < self.rate_limit_rate + self.failure_rate:
+            raise RuntimeError("Injected backend failure")
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+# --- Local stand-ins for Azure services ---
+def _hashed_vector(text: str, dimensions: int):
+    from hybrid_search import tokenize
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in tokenize(text):
+        vector[zlib.crc32(token.encode("utf-8")) % dimensions] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def make_fake_embeddings(faults: FaultInjector, timings: StageTimings, dimensions: int = 256):
+    from langchain_core.embeddings import Embeddings
+
+    class FakeEmbeddings(Embeddings):
+        """Deterministic hashed bag-of-words vectors, so similar texts really are close."""
+
+        def embed_query(self, text):
+            started = time.perf_counter()
+            try:
+                faults()
+                return _hashed_vector(text, dimensions).tolist()
+            finally:
+                timings.record("embed_query", time.perf_counter() - started)
+
+        def embed_documents(self, texts):
+            started = time.perf_counter()
+            try:
+                faults()
+                return [_hashed_vector(text, dimensions).tolist() for text in texts]
+            finally:
+                timings.record("embed_documents", time.perf_counter() - started)
+
+    return FakeEmbeddings()
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """invoke()/stream() with a time-to-first-token plus a per-token delay; answers quote the context."""
+
+    def __init__(self, faults: FaultInjector, timings: StageTimings, ttft_ms: float, token_ms: float, answer_tokens: int):
+        self.faults = faults
+        self.timings = timings
+        self.ttft_s = ttft_ms / 1000.0
+        self.token_s = token_ms / 1000.0
+        self.answer_tokens = answer_tokens
+
+    def _answer_words(self, prompt: str) -> list:
+        context = prompt.split("**CONTEXT:**")[-1]
+        words = context.split() or ["No", "context."]
+        return [words[i % len(words)] for i in range(self.answer_tokens)]
+
+    def invoke(self, prompt):
+        started = time.perf_counter()
+        try:
+            self.faults(self.ttft_s)
+            words = self._answer_words(str(prompt))
+            time.sleep(self.token_s * len(words))
+            return FakeMessage(" ".join(words))
+        finally:
+            self.timings.record("llm_invoke", time.perf_counter() - started)
+
+    def stream(self, prompt):
+        started = time.perf_counter()
+        try:
+            self.faults(self.ttft_s)
+            for i, word in enumerate(self._answer_words(str(prompt))):
+                if i:
+                    time.sleep(self.token_s)
+                yield FakeMessage(word + " ")
+        finally:
+            self.timings.record("llm_stream", time.perf_counter() - started)
+
+
+class FakeSearchStore:
+    """In-memory cosine search with AzureSearch's similarity_search(query, k, filters) signature."""
+
+    supports_odata_filters = True
+
+    def __init__(self, chunks: list, embeddings, faults: FaultInjector, timings: StageTimings, dimensions: int = 256):
+        self.chunks = chunks
+        self.embedding_function = embeddings.embed_query
+        self.faults = faults
+        self.timings = timings
+        self._matrix = np.stack([_hashed_vector(c.page_content, dimensions) for c in chunks]) if chunks else np.zeros((0, dimensions), dtype=np.float32)
+        self._sources = np.array([c.metadata.get("source_document", "") for c in chunks])
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4, filters: str = None, **kwargs):
+        query_vector = np.asarray(self.embedding_function(query), dtype=np.float32)
+        started = time.perf_counter()
+        try:
+            self.faults()
+            scores = self._matrix @ query_vector
+            if filters:
+                source = filters.split("eq", 1)[1].strip().strip("'")
+                scores = np.where(self._sources == source, scores, -np.inf)
+            top = [i for i in np.argsort(scores)[::-1][:k] if np.isfinite(scores[i])]
+            return [(self.chunks[i], float(scores[i])) for i in top]
+        finally:
+            self.timings.record("vector_search", time.perf_counter() - started)
+
+    def similarity_search(self, query: str, k: int = 4, filters: str = None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k, filters=filters)]
+
+
+# --- Scenarios ---
+def load_corpus(timings: StageTimings) -> list:
+    """Chunks every DOCX and layout-JSON asset through the pipeline's extraction code, and writes
+    the index manifest so "All Indexed Documents" sees the same document list as production."""
+    import index_pipeline
+    import rag_core_turbo
+    chunks, documents = [], {}
+    for name in index_pipeline.directory_source(ASSETS_DIR)[0]:
+        with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+            file_bytes = f.read()
+        started = time.perf_counter()
+        document_chunks = index_pipeline.extract_chunks(name, file_bytes, rag_core_turbo.hash_file_bytes(file_bytes))
+        timings.record("ingest_document", time.perf_counter() - started)
+        print(f"  {name}: {len(document_chunks)} chunks in {time.perf_counter() - started:.2f}s")
+        chunks.extend(document_chunks)
+        documents[index_pipeline.indexed_name(name)] = {"content_hash": rag_core_turbo.hash_file_bytes(file_bytes),
+                                                         "chunk_count": len(document_chunks), "indexed_at": time.time()}
+    index_pipeline.save_index_manifest({"documents": documents})
+    return chunks
+
+
+def measure(fn, trace_memory: bool):
+    """Runs fn and returns (result, wall seconds, traced peak bytes or None)."""
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        wall = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return result, wall, peak
+
+
+def bench_upload_index(rag_core_turbo, timings: StageTimings, trace_memory: bool) -> dict:
+    """The sidebar upload path (parse, split, embed, persist), cold and then served from the content-hash cache."""
+    results = {}
+    for name in sorted(f for f in os.listdir(ASSETS_DIR) if f.lower().endswith((".pdf", ".docx"))):
+        with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+            file_bytes = f.read()
+        store, cold_s, cold_peak = measure(lambda: rag_core_turbo.build_or_load_upload_index(file_bytes, name), trace_memory)
+        _, warm_s, _ = measure(lambda: rag_core_turbo.build_or_load_upload_index(file_bytes, name), False)
+        results[name] = {"chunks": len(store.docstore._dict), "cold_ms": round(cold_s * 1000, 3),
+                         "cached_ms": round(warm_s * 1000, 3), "cold_peak_bytes": cold_peak}
+    return results
+
+
+def bench_retrieval(rag_core_turbo, store, questions: list, iterations: int, documents: list) -> dict:
+    """Filtered (single-document) retrieval, and unfiltered retrieval with and without per-document fan-out."""
+    results = {}
+    fanout_setting = rag_core_turbo.RETRIEVAL_FANOUT
+    try:
+        for mode in ("vector", "hybrid"):
+            for scope in ("filtered", "all_single_search", "all_fanout"):
+                rag_core_turbo.RETRIEVAL_FANOUT = scope == "all_fanout"
+                durations, covered = [], []
+                for i in range(iterations):
+                    target = documents[i % len(documents)] if scope == "filtered" else None
+                    started = time.perf_counter()
+                    docs = rag_core_turbo._retrieve_documents(questions[i % len(questions)], store, target, retrieval_mode=mode)
+                    durations.append(time.perf_counter() - started)
+                    covered.append(len({d.metadata.get("source_document") for d in docs}))
+                results[f"{mode}_{scope}"] = {**summarize(durations), "mean_documents_covered": round(sum(covered) / len(covered), 2)}
+    finally:
+        rag_core_turbo.RETRIEVAL_FANOUT = fanout_setting
+    return results
+
+
+def _chunk_stats(chunks: list, seconds: list) -> dict:
+    ordered = sorted(seconds)
+    return {"chunks": len(chunks), "median_parse_ms": round(1000 * ordered[len(ordered) // 2], 3),
+            "table_chunks": sum(c.metadata.get("chunk_type") == "table" for c in chunks),
+            "near_empty_chunks": sum(len(c.page_content.strip()) < 50 for c in chunks),
+            "mean_chunk_chars": round(sum(len(c.page_content) for c in chunks) / len(chunks), 1) if chunks else 0.0}
+
+
+# (case, rows, expected): whether docx_loader takes the unmarked first row as the column header.
+# A row of None cells is one cell merged across the table.
+IMPLICIT_HEADER_CASES = [
+    ("column headings", [["Item", "Description", "Qty"], ["1", "Laptop", "20"], ["2", "Docking station", "20"]], True),
+    ("merged banner", [None, ["Item", "Description", "Qty"], ["1", "Laptop", "20"]], False),
+    ("single column", [["Requirements"], ["Valid tax clearance"], ["B-BBEE certificate"]], False),
+    ("repeated cells", [["Pricing", "Pricing", "Pricing"], ["Rate", "Hours", "Total"], ["500", "10", "5000"]], False),
+    ("key/value with colons", [["Bid number:", "RFB 01/2024"], ["Closing date:", "12 March 2024"], ["Briefing:", "Compulsory"]], False),
+    ("key/value pair", [["Closing date", "12 March 2024"], ["Briefing session", "Compulsory"], ["Validity", "90 days"]], False),
+]
+
+
+def check_implicit_headers() -> dict:
+    """Runs IMPLICIT_HEADER_CASES through docx_loader; raises if any table's header is misdetected."""
+    import io
+    import docx
+    import docx_loader
+    results = {}
+    for case, rows, expected in IMPLICIT_HEADER_CASES:
+        columns = max(len(row) for row in rows if row)
+        document = docx.Document()
+        table = document.add_table(rows=len(rows), cols=columns)
+        for r, row in enumerate(rows):
+            if row is None:
+                table.cell(r, 0).merge(table.cell(r, columns - 1)).text = "SCHEDULE 6: complete every field and sign each page"
+                continue
+            for c, text in enumerate(row):
+                table.cell(r, c).text = text
+        buffer = io.BytesIO()
+        document.save(buffer)
+        chunks = [c for c in docx_loader.load_docx_chunks(buffer.getvalue(), case) if "row_start" in c.metadata]
+        detected = bool(chunks) and min(c.metadata["row_start"] for c in chunks) > 0  # A banner chunk has row 0.
+        if detected != expected:
+            raise RuntimeError(f"docx_loader header detection for '{case}': expected {expected}, got {detected}")
+        results[case] = detected
+    return results
+
+
+def bench_docx_extraction(repeats: int) -> dict:
+    """docx_loader vs the previous Docx2txtLoader + 1000/200 splitter path: parse time and chunk shape per file,
+    plus the whole set parsed sequentially vs on the process pool."""
+    import docx_loader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    paths = {name: os.path.join(ASSETS_DIR, name) for name in sorted(os.listdir(ASSETS_DIR)) if name.lower().endswith(".docx")}
+    results = {"implicit_headers": check_implicit_headers(), "files": {}}
+    for name, path in paths.items():
+        entry = {}
+        seconds = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            chunks = docx_loader.load_docx_chunks(path, name)
+            seconds.append(time.perf_counter() - started)
+        entry["docx_loader"] = _chunk_stats(chunks, seconds)
+        try:
+            from langchain_community.document_loaders import Docx2txtLoader
+            seconds = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(Docx2txtLoader(path).load())
+                seconds.append(time.perf_counter() - started)
+            entry["docx2txt"] = _chunk_stats(chunks, seconds)
+        except ImportError as e:
+            entry["docx2txt"] = {"error": f"Docx2txtLoader unavailable: {e}"}
+        results["files"][name] = entry
+    started = time.perf_counter()
+    for name, path in paths.items():
+        docx_loader.load_docx_chunks(path, name)
+    results["batch_sequential_ms"] = round(1000 * (time.perf_counter() - started), 3)
+    list(docx_loader.load_docx_batch(paths.items()))  # Start the pool's workers outside the measurement.
+    started = time.perf_counter()
+    list(docx_loader.load_docx_batch(paths.items()))
+    results["batch_process_pool_ms"] = round(1000 * (time.perf_counter() - started), 3)
+    results["process_workers"] = docx_loader.DOCX_PROCESS_WORKERS
+    return results
+
+
+def _run_query(rag_core_turbo, store, question: str, target: str, streaming: bool) -> dict:
+    started = time.perf_counter()
+    if not streaming:
+        result = rag_core_turbo.perform_manual_rag_query(question, store, rag_core_turbo.get_llm(), rag_core_turbo.RFP_PROMPT, target_document_name=target)
+        return {"total_s": time.perf_counter() - started, "error": result["answer"].startswith(("An error occurred", "Error:"))}
+    first_token_s, sources_s, answer = None, None, ""
+    for event in rag_core_turbo.stream_manual_rag_query(question, store, rag_core_turbo.get_llm(), rag_core_turbo.RFP_PROMPT, target_document_name=target):
+        if event["type"] == "sources":
+            sources_s = time.perf_counter() - started
+        elif event["type"] == "token" and first_token_s is None:
+            first_token_s = time.perf_counter() - started
+        elif event["type"] == "done":
+            answer = event["answer"]
+    return {"total_s": time.perf_counter() - started, "sources_s": sources_s, "first_token_s": first_token_s,
+            "error": "An error occurred" in answer or answer.startswith("Error:")}
+
+
+def bench_queries(rag_core_turbo, store, questions: list, iterations: int, documents: list, streaming: bool, cold: bool) -> dict:
+    """Sequential end-to-end queries. cold=True clears the answer/embedding caches before every query."""
+    runs = []
+    for i in range(iterations):
+        if cold:
+            rag_core_turbo.answer_cache.clear()
+            rag_core_turbo.get_embeddings_client().clear()
+        runs.append(_run_query(rag_core_turbo, store, questions[i % len(questions)], documents[i % len(documents)] if i % 2 else None, streaming))
+    report = {"total": summarize([r["total_s"] for r in runs]), "errors": sum(r["error"] for r in runs)}
+    if streaming:
+        report["sources"] = summarize([r["sources_s"] for r in runs if r["sources_s"] is not None])
+        report["first_token"] = summarize([r["first_token_s"] for r in runs if r["first_token_s"] is not None])
+    return report
+
+
+def bench_throughput(rag_core_turbo, store, questions: list, iterations: int, documents: list, concurrency_levels: list) -> dict:
+    """Queries per second with N concurrent users, caches cleared at the start of each level."""
+    results = {}
+    for concurrency in concurrency_levels:
+        rag_core_turbo.answer_cache.clear()
+        rag_core_turbo.get_embeddings_client().clear()
+        jobs = [(questions[i % len(questions)], documents[i % len(documents)] if i % 2 else None) for i in range(iterations)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            runs = list(executor.map(lambda job: _run_query(rag_core_turbo, store, job[0], job[1], False), jobs))
+        wall = time.perf_counter() - started
+        results[str(concurrency)] = {"queries": len(runs), "wall_s": round(wall, 3), "qps": round(len(runs) / wall, 3),
+                                     "latency": summarize([r["total_s"] for r in runs]), "errors": sum(r["error"] for r in runs)}
+    return results
+
+
+def bench_batch(rag_core_turbo, store, questions: list, concurrency: int) -> dict:
+    rag_core_turbo.answer_cache.clear()
+    rag_core_turbo.get_embeddings_client().clear()
+    started = time.perf_counter()
+    results = list(rag_core_turbo.perform_batch_rag_queries(questions, store, rag_core_turbo.get_llm(), rag_core_turbo.RFP_PROMPT, max_concurrency=concurrency))
+    wall = time.perf_counter() - started
+    return {"questions": len(results), "max_concurrency": concurrency, "wall_s": round(wall, 3),
+            "per_question": summarize([r["latency_s"] for r in results])}
+
+
+def bench_document_analysis(rag_core_turbo, store, documents: list, concurrency_levels: list) -> dict:
+    """Whole-document map-reduce on the largest document: cold at each concurrency level, then warm (map results cached)."""
+    lexical_index = store.lexical_index
+    document = max(documents, key=lambda name: len(lexical_index.documents_for_source(name)))
+    question = "List every mandatory requirement and deadline."
+
+    def run(concurrency):
+        started, first_progress, last_map, reduce_levels = time.perf_counter(), None, {}, 0
+        for event in rag_core_turbo.stream_document_analysis(question, store, rag_core_turbo.get_llm(), target_document_name=document, max_concurrency=concurrency):
+            if event["type"] != "progress":
+                continue
+            first_progress = first_progress or time.perf_counter() - started
+            if event["stage"] == "map":
+                last_map = event
+            else:
+                reduce_levels += 1
+        return {"total_s": round(time.perf_counter() - started, 3), "first_progress_s": round(first_progress or 0.0, 3),
+                "chunks": last_map.get("total", 0), "cached_chunks": last_map.get("cached", 0), "reduce_levels": reduce_levels}
+
+    results = {"document": document, "cold": {}}
+    for concurrency in concurrency_levels:
+        rag_core_turbo.map_result_cache.clear()
+        results["cold"][str(concurrency)] = run(concurrency)
+    results["warm"] = run(max(concurrency_levels))
+    return results
+
+
+# Scenarios that clear the caches first; each must reach the (fake) embedder or its numbers are warm.
+COLD_SCENARIOS = {"query_cold", "stream_cold", "throughput", "batch_checklist"}
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline RAG latency/throughput benchmark with local fakes.")
+    parser.add_argument("--iterations", type=int, default=40, help="Queries per sequential scenario.")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated concurrency levels for the throughput scenario.")
+    parser.add_argument("--embed-latency-ms", type=float, default=30.0)
+    parser.add_argument("--search-latency-ms", type=float, default=40.0)
+    parser.add_argument("--llm-ttft-ms", type=float, default=300.0, help="Fake LLM time to first token.")
+    parser.add_argument("--llm-token-ms", type=float, default=4.0, help="Fake LLM delay per generated token.")
+    parser.add_argument("--answer-tokens", type=int, default=150)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative latency jitter (0.2 = +/-20%%).")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of an injected error per backend call.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of an injected 429 per backend call.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--trace-memory", action="store_true", help="Trace Python allocations for peak memory (slows the traced scenarios).")
+    parser.add_argument("--analysis-rpm", type=float, default=0.0, help="Request rate limit for whole-document analysis (0 = unlimited).")
+    parser.add_argument("--scenarios", default="", help="Comma-separated subset of scenarios to run (default: all).")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    # Caches and persisted indexes go to a throwaway directory so every run starts cold. Paths that
+    # can be configured on their own are overridden too: load_dotenv() never replaces a set variable,
+    # so a .env pointing at the real manifest or caches can't be cleared or overwritten by a run.
+    cache_dir = tempfile.mkdtemp(prefix="rag-bench-")
+    os.environ.update({"RAG_CACHE_DIR": cache_dir,
+                       "INDEX_MANIFEST_PATH": os.path.join(cache_dir, "index_manifest.json"),
+                       "MAP_RESULT_CACHE_PATH": os.path.join(cache_dir, "map_results.sqlite"),
+                       "EMBEDDING_CACHE_PATH": os.path.join(cache_dir, "embeddings.sqlite"),
+                       "METRICS_EXPORT_PATH": "", "METRICS_PORT": "0"})
+    os.environ.setdefault("RAG_TRACE_LOG", "0")  # A trace line per query would drown the report.
+    import_started = time.perf_counter()
+    import rag_core_turbo
+    import_s = time.perf_counter() - import_started
+
+    timings = StageTimings()
+    embeddings = make_fake_embeddings(FaultInjector(args.embed_latency_ms, args.jitter, args.failure_rate, args.rate_limit_rate, args.seed), timings)
+    llm = FakeChatModel(FaultInjector(0.0, args.jitter, args.failure_rate, args.rate_limit_rate, args.seed + 1), timings,
+                        args.llm_ttft_ms, args.llm_token_ms, args.answer_tokens)
+    rag_core_turbo.use_backend_clients(embeddings=embeddings, llm=llm)
+
+    print("--- Loading corpus from assets/ ---")
+    chunks = load_corpus(timings)
+    documents = sorted({c.metadata.get("source_document", "") for c in chunks})
+    store = FakeSearchStore(chunks, rag_core_turbo.get_embeddings_client(),
+                            FaultInjector(args.search_latency_ms, args.jitter, args.failure_rate, args.rate_limit_rate, args.seed + 2), timings)
+    from hybrid_search import BM25Index
+    store.lexical_index = BM25Index(chunks)
+    rag_core_turbo.use_backend_clients(vector_store=store)
+    rag_core_turbo._analysis_rate_limiter = rag_core_turbo.RateLimiter(args.analysis_rpm)
+    concurrency_levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    report = {"config": vars(args), "environment": {"python": platform.python_version(), "platform": platform.platform()},
+              "corpus": {"documents": documents, "chunks": len(chunks)}, "import_s": round(import_s, 3), "scenarios": {}}
+    scenarios = [
+        ("upload_index", lambda: bench_upload_index(rag_core_turbo, timings, args.trace_memory)),
+        ("retrieval", lambda: bench_retrieval(rag_core_turbo, store, BENCHMARK_QUESTIONS, args.iterations, documents)),
+        ("query_cold", lambda: bench_queries(rag_core_turbo, store, BENCHMARK_QUESTIONS, args.iterations, documents, False, True)),
+        ("query_warm", lambda: bench_queries(rag_core_turbo, store, BENCHMARK_QUESTIONS, args.iterations, documents, False, False)),
+        ("stream_cold", lambda: bench_queries(rag_core_turbo, store, BENCHMARK_QUESTIONS, args.iterations, documents, True, True)),
+        ("throughput", lambda: bench_throughput(rag_core_turbo, store, BENCHMARK_QUESTIONS, args.iterations, documents, concurrency_levels)),
+        ("batch_checklist", lambda: bench_batch(rag_core_turbo, store, rag_core_turbo.DEFAULT_CHECKLIST_QUESTIONS + BENCHMARK_QUESTIONS, max(concurrency_levels))),
+        ("document_analysis", lambda: bench_document_analysis(rag_core_turbo, store, documents, concurrency_levels)),
+        ("docx_extraction", lambda: bench_docx_extraction(repeats=5)),
+    ]
+    selected = {name.strip() for name in args.scenarios.split(",") if name.strip()}
+    for name, run in scenarios:
+        if selected and name not in selected:
+            continue
+        print(f"--- Scenario: {name} ---")
+        timings.reset()
+        result, wall, peak = measure(run, args.trace_memory and name != "upload_index")
+        report["scenarios"][name] = {"result": result, "wall_s": round(wall, 3), "stages": timings.summary(), "peak_traced_bytes": peak}
+        if name in COLD_SCENARIOS:
+            embedder_calls = sum(report["scenarios"][name]["stages"].get(stage, {}).get("count", 0) for stage in ("embed_query", "embed_documents"))
+            if not embedder_calls:
+                raise RuntimeError(f"Scenario '{name}' is meant to start cold but never called the embedder; a cache was not cleared.")
+        print(json.dumps(report["scenarios"][name]["result"], indent=2))
+
+    report["cache_stats"] = rag_core_turbo.get_cache_stats()
+    import rag_metrics
+    report["metrics"] = rag_metrics.registry.snapshot()
+    report["peak_rss_bytes"] = peak_rss_bytes()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"--- Benchmark results written to {args.output} ---")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+# chat_store.py
+"""Chat history in Supabase, read a page at a time.
+
+Expected tables (create once in the Supabase SQL editor):
+
+    create table chats (
+        id text primary key,
+        user_id uuid not null,
+        title text not null default '',
+        created_at timestamptz not null default now(),
+        updated_at timestamptz not null default now()
+    );
+    create index chats_user_updated on chats (user_id, updated_at desc);
+
+    create table chat_messages (
+        id bigint generated always as identity primary key,
+        chat_id text not null references chats (id) on delete cascade,
+        user_id uuid not null,
+        role text not null,
+        content text not null,
+        raw_content text,
+        sources_markdown text,
+        suggested_questions jsonb,
+        extra jsonb,
+        created_at timestamptz not null default now()
+    );
+    create index chat_messages_chat_id on chat_messages (chat_id, id desc);
+
+The client is one cached resource shared by every session, so row-level security on auth.uid()
+can't tell users apart; every read and write here filters on user_id itself.
+
+Pages are keyset-paginated (updated_at for chats, id for messages), so loading an older page
+costs the same however long the history is. Every call fails soft: on an error it prints a
+warning and the app keeps the chat in session state only, as it did before.
+"""
+
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+CHATS_TABLE = os.getenv("SUPABASE_CHATS_TABLE", "chats")
+MESSAGES_TABLE = os.getenv("SUPABASE_MESSAGES_TABLE", "chat_messages")
+CHATS_PAGE_SIZE = int(os.getenv("CHATS_PAGE_SIZE", "15"))
+MESSAGES_PAGE_SIZE = int(os.getenv("MESSAGES_PAGE_SIZE", "20"))
+MAX_TITLE_CHARS = 60
+
+# Message keys stored in their own columns; anything else (e.g. a checklist) goes in "extra".
+_MESSAGE_COLUMNS = ("role", "content", "raw_content", "sources_markdown", "suggested_questions")
+
+
+def new_chat_id() -> str:
+    # Keeps the old chat_<unix time> prefix; the suffix keeps ids unique across users and workers.
+    return f"chat_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+
+def chat_title(message_content: str) -> str:
+    title = " ".join((message_content or "").split())
+    return title[:MAX_TITLE_CHARS] + "..." if len(title) > MAX_TITLE_CHARS else title
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _to_row(message: dict, chat_id: str, user_id: str) -> dict:
+    row = {key: message.get(key) for key in _MESSAGE_COLUMNS}
+    extra = {key: value for key, value in message.items() if key not in _MESSAGE_COLUMNS and key != "id"}
+    row.update(chat_id=chat_id, user_id=user_id, extra=extra or None)
+    return row
+
+
+def _from_row(row: dict) -> dict:
+    message = {key: row[key] for key in _MESSAGE_COLUMNS if row.get(key) is not None}
+    message.update(row.get("extra") or {})
+    message["id"] = row["id"]
+    return message
+
+
+def list_chats(client, user_id: str, before: str = None, limit: int = None):
+    """(chats, has_more): the user's chats, most recently updated first, older than `before` (an updated_at)."""
+    limit = limit or CHATS_PAGE_SIZE
+    try:
+        query = client.table(CHATS_TABLE).select("id,title,updated_at").eq("user_id", user_id)
+        if before:
+            query = query.lt("updated_at", before)
+        rows = query.order("updated_at", desc=True).limit(limit + 1).execute().data or []
+        return rows[:limit], len(rows) > limit
+    except Exception as e:
+        print(f"⚠️ Could not load chat list: {e}")
+        return [], False
+
+
+def load_messages(client, user_id: str, chat_id: str, before_id: int = None, limit: int = None):
+    """(messages, has_more): up to `limit` of the user's messages in a chat older than message `before_id`, oldest first."""
+    limit = limit or MESSAGES_PAGE_SIZE
+    try:
+        query = client.table(MESSAGES_TABLE).select("*").eq("chat_id", chat_id).eq("user_id", user_id)
+        if before_id is not None:
+            query = query.lt("id", before_id)
+        rows = query.order("id", desc=True).limit(limit + 1).execute().data or []
+        return [_from_row(row) for row in reversed(rows[:limit])], len(rows) > limit
+    except Exception as e:
+        print(f"⚠️ Could not load messages for chat '{chat_id}': {e}")
+        return [], False
+
+
+def save_message(client, user_id: str, chat_id: str, message: dict, title: str = None) -> bool:
+    """Appends a message to one of the user's chats, creating the chat on its first message. Sets message["id"] on success."""
+    try:
+        now = _now()
+        owned = client.table(CHATS_TABLE).update({"updated_at": now}).eq("id", chat_id).eq("user_id", user_id).execute().data
+        if not owned:
+            # A plain insert, not an upsert: an id that belongs to another user fails here instead of changing hands.
+            client.table(CHATS_TABLE).insert({"id": chat_id, "user_id": user_id, "title": title or "", "updated_at": now}).execute()
+        rows = client.table(MESSAGES_TABLE).insert(_to_row(message, chat_id, user_id)).execute().data or []
+        if rows:
+            message["id"] = rows[0]["id"]
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not save message to chat '{chat_id}': {e}")
+        return False
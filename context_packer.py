@@ -0,0 +1,154 @@
+# context_packer.py
+"""Token-budgeted context assembly for the RAG prompt.
+
+Retrieved chunks from the same source often overlap (the splitters use chunk_overlap=200), so
+adjacent chunks are merged into one passage before the prompt is built, and the result is trimmed
+to a token budget in relevance order.
+"""
+
+import os
+import threading
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "cl100k_base")
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 400
+# Don't bother including a truncated passage smaller than this.
+MIN_PARTIAL_TOKENS = 50
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+                except Exception as e:
+                    # tiktoken downloads its BPE file on first use; fall back to an estimate when offline.
+                    print(f"⚠️ tiktoken unavailable ({e}); estimating tokens as characters / 4.")
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    return len(encoding.encode(text, disallowed_special=())) if encoding else (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def _merge_text(first: str, second: str):
+    """first + second with their shared overlap written once, or None if they don't touch."""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    for size in range(min(len(first), len(second), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+
+def _source_of(doc) -> str:
+    return doc.metadata.get("source_document", "")
+
+
+def _fit_members(members: list, token_budget: int):
+    """Best-ranked part of a merged block that fits token_budget: (text, docs), or (None, []) when
+    even the best-ranked chunk alone is too big.
+
+    Starting from the best-ranked chunk, overlapping neighbours are merged in rank order while the
+    result fits, so a lower-ranked chunk is dropped whole instead of the best one being cut.
+    """
+    ordered = sorted(members, key=lambda member: member[0])
+    text = ordered[0][1].page_content
+    if count_tokens(text) > token_budget:
+        return None, []
+    used, pending = [ordered[0]], ordered[1:]
+    while pending:
+        for member in pending:
+            combined = _merge_text(text, member[1].page_content) or _merge_text(member[1].page_content, text)
+            if combined is not None:
+                break
+        else:
+            break  # What's left only touched chunks that were dropped.
+        pending.remove(member)
+        if count_tokens(combined) <= token_budget:
+            text = combined
+            used.append(member)
+    return text, [doc for _, doc in used]
+
+
+def pack_context(docs: list, token_budget: int = None, separator: str = CONTEXT_SEPARATOR):
+    """Builds the context string from docs (given in relevance order).
+
+    Returns (context, used_docs, report). used_docs are the chunks that made it into the
+    context; report holds original/packed/saved token counts and how many chunks were merged,
+    dropped or truncated.
+    """
+    token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+    # Each block: [best_rank, text, [(rank, doc), ...]]
+    blocks = []
+    merged = 0
+    for rank, doc in enumerate(docs):
+        block = [rank, doc.page_content, [(rank, doc)]]
+        changed = True
+        while changed:
+            changed = False
+            for i, other in enumerate(blocks):
+                if _source_of(other[2][0][1]) != _source_of(doc):
+                    continue
+                combined = _merge_text(other[1], block[1]) or _merge_text(block[1], other[1])
+                if combined is not None:
+                    del blocks[i]
+                    block = [min(other[0], block[0]), combined, other[2] + block[2]]
+                    merged += 1
+                    changed = True
+                    break
+        blocks.append(block)
+    blocks.sort(key=lambda b: b[0])
+
+    separator_tokens = count_tokens(separator)
+    parts, used_docs, used_tokens, dropped, truncated = [], [], 0, 0, False
+    for _, text, members in blocks:
+        block_tokens = count_tokens(text)
+        cost = block_tokens + (separator_tokens if parts else 0)
+        if used_tokens + cost <= token_budget:
+            parts.append(text)
+            used_docs.extend(doc for _, doc in members)
+            used_tokens += cost
+            continue
+        remaining = token_budget - used_tokens - (separator_tokens if parts else 0)
+        if remaining < MIN_PARTIAL_TOKENS or truncated:
+            dropped += len(members)
+            continue
+        # Keep the best-ranked chunks of the block whole; only if even the best one alone is too big,
+        # cut that one chunk. Either way used_docs lists just the chunks whose text is in the context.
+        partial_text, partial_docs = _fit_members(members, remaining)
+        if partial_text is None:
+            best = min(members, key=lambda member: member[0])[1]
+            partial_text, partial_docs = truncate_to_tokens(best.page_content, remaining), [best]
+        parts.append(partial_text)
+        used_docs.extend(partial_docs)
+        used_tokens += count_tokens(partial_text)
+        dropped += len(members) - len(partial_docs)
+        truncated = True
+
+    context = separator.join(parts)
+    original_tokens = sum(count_tokens(doc.page_content) for doc in docs) + separator_tokens * max(len(docs) - 1, 0)
+    packed_tokens = count_tokens(context) if parts else 0
+    report = {"original_tokens": original_tokens, "packed_tokens": packed_tokens,
+              "saved_tokens": max(original_tokens - packed_tokens, 0), "merged_chunks": merged,
+              "dropped_chunks": dropped, "truncated": truncated, "token_budget": token_budget}
+    return context, used_docs, report
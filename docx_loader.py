@@ -0,0 +1,258 @@
+# docx_loader.py
+"""Structure-aware chunks from DOCX files, read with python-docx's XML tree directly.
+
+The body is walked in document order. Paragraphs are grouped within their heading's section and
+tables become whole-row chunks with the header row(s) repeated, so returnable schedules keep
+their columns. Metadata matches layout_loader.py (source_document, chunk_type, section,
+table_index, row_start/row_end). Cell and run text is read straight from the w:t elements instead
+of through python-docx's Table/Cell objects, which are slow on large tables.
+"""
+
+import io
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
+from langchain_core.documents import Document as LCDocument
+from layout_loader import DEFAULT_MAX_CHARS, _split_long_text
+
+# Paragraphs in a heading style but longer than this are body text formatted as a heading.
+MAX_HEADING_CHARS = 200
+# An unmarked first row longer than this is an instruction banner, not column headings.
+MAX_IMPLICIT_HEADER_CHARS = 300
+DOCX_PROCESS_WORKERS = int(os.getenv("DOCX_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_P, _TBL, _TR, _TC = qn("w:p"), qn("w:tbl"), qn("w:tr"), qn("w:tc")
+_T, _TAB, _BR, _CR = qn("w:t"), qn("w:tab"), qn("w:br"), qn("w:cr")
+_PPR, _PSTYLE, _VAL = qn("w:pPr"), qn("w:pStyle"), qn("w:val")
+_TRPR, _TBLHEADER, _SDT, _SDTCONTENT = qn("w:trPr"), qn("w:tblHeader"), qn("w:sdt"), qn("w:sdtContent")
+_TCPR, _GRIDSPAN = qn("w:tcPr"), qn("w:gridSpan")
+
+
+def _text_of(element) -> str:
+    parts = [(node.text or "") if node.tag == _T else " " for node in element.iter(_T, _TAB, _BR, _CR)]
+    return " ".join("".join(parts).split())
+
+
+def _cell_text(tc) -> str:
+    return " ".join(text for text in (_text_of(p) for p in tc.iter(_P)) if text)
+
+
+def _classify_styles(document):
+    """(heading style ids, table-of-contents style ids). A style is a heading if it, or a style it
+    is based on, is Title/Heading n; custom styles like "Level1" are usually based on Heading 1.
+    Outline levels are ignored: templates set them on list and body styles too."""
+    headings, toc = set(), set()
+    for style in document.styles:
+        if style.type != WD_STYLE_TYPE.PARAGRAPH:
+            continue
+        if (style.name or "").lower().startswith("toc"):
+            toc.add(style.style_id)
+            continue
+        current, depth = style, 0
+        while current is not None and depth < 10:
+            name = (current.name or "").lower()
+            if name == "title" or name.startswith("heading"):
+                headings.add(style.style_id)
+                break
+            current, depth = current.base_style, depth + 1
+    return headings, toc
+
+
+def _iter_block_elements(parent):
+    """w:p and w:tbl children in order, looking inside content controls (w:sdt)."""
+    for child in parent.iterchildren():
+        if child.tag in (_P, _TBL):
+            yield child
+        elif child.tag == _SDT:
+            content = child.find(_SDTCONTENT)
+            if content is not None:
+                yield from _iter_block_elements(content)
+
+
+# --- Tables ---
+def _render_row(cells) -> str:
+    return "| " + " | ".join(cells) + " |"
+
+
+def _row_width(tr) -> int:
+    """Grid columns a row covers, counting horizontally merged cells (w:gridSpan) at their span."""
+    width = 0
+    for tc in tr.iterchildren(_TC):
+        tc_pr = tc.find(_TCPR)
+        span = tc_pr.find(_GRIDSPAN) if tc_pr is not None else None
+        width += int(span.get(_VAL) or 1) if span is not None else 1
+    return width
+
+
+def _looks_like_key_value(first, body) -> bool:
+    """A label/value pair ("Closing date | 12 March 2024", "Bid number: | RFB 01") rather than column headings."""
+    if any(cell.endswith(":") for cell in first):
+        return True
+    if len(first) != 2:
+        return False
+    labels = [cells[0] for cells in body if cells and cells[0]]
+    return first[1][:1].isdigit() or sum(label.endswith(":") for label in labels) * 2 > len(labels)
+
+
+def _is_implicit_header(rows) -> bool:
+    """An unmarked first row is a header only if it has two or more distinct, short cells, is as wide
+    as most body rows and isn't a label/value pair. A merged one-cell banner above the columns
+    (e.g. "SCHEDULE 6 ... instructions") or the first row of a key/value table is not."""
+    first, first_width = rows[0][0], rows[0][2]
+    body = [cells for cells, _, _ in rows[1:] if any(cells)]
+    body_widths = [width for cells, _, width in rows[1:] if any(cells)]
+    labels = [cell for cell in first if cell]
+    if not body_widths or len(labels) < 2 or len(_render_row(first)) > MAX_IMPLICIT_HEADER_CHARS:
+        return False
+    if len(set(labels)) < len(labels) or _looks_like_key_value(first, body):
+        return False  # Merged cells repeating their text, or label/value data.
+    return first_width == max(set(body_widths), key=body_widths.count)
+
+
+def _table_chunks(tbl, table_index: int, section: str, source_name: str, max_chars: int) -> list:
+    """One chunk per group of whole rows; header rows (marked, else a column-heading first row) start every chunk."""
+    rows = []
+    for tr in tbl.iterchildren(_TR):
+        cells = [_cell_text(tc) for tc in tr.iterchildren(_TC)]
+        tr_pr = tr.find(_TRPR)
+        rows.append((cells, tr_pr is not None and tr_pr.find(_TBLHEADER) is not None, _row_width(tr)))
+    if not rows:
+        return []
+    header_rows = [i for i, (_, is_header, _) in enumerate(rows) if is_header]
+    banner_row = None
+    if not header_rows and len(rows) > 1:
+        if _is_implicit_header(rows):
+            header_rows = [0]
+        elif len(set(cell for cell in rows[0][0] if cell)) == 1:
+            banner_row = 0  # Otherwise an unmarked first row (e.g. a label/value pair) is an ordinary row.
+
+    header = "\n".join(_render_row(rows[i][0]) for i in header_rows)
+    # Half the budget at most, so every chunk keeps room for its rows and stays within max_chars.
+    prefix = "\n".join(part for part in (section, header) if part)[:max_chars // 2]
+    base_metadata = {"source_document": source_name, "chunk_type": "table", "section": section, "table_index": table_index}
+    chunks, group = [], []  # group: (row_index, rendered_row)
+    if banner_row is not None:
+        banner = " ".join(cell for cell in dict.fromkeys(rows[banner_row][0]) if cell)  # Merged cells repeat their text.
+        section_prefix = f"{section}\n" if section else ""
+        for piece in _split_long_text(banner, max_chars - len(section_prefix)) if len(section_prefix) + len(banner) > max_chars else [banner]:
+            chunks.append(LCDocument(page_content=section_prefix + piece, metadata={**base_metadata, "chunk_type": "text", "row_start": 0, "row_end": 0}))
+
+    def flush():
+        if not group:
+            return
+        text = "\n".join(([prefix] if prefix else []) + [rendered for _, rendered in group])
+        chunks.append(LCDocument(page_content=text, metadata={**base_metadata, "row_start": group[0][0], "row_end": group[-1][0]}))
+        group.clear()
+
+    size = len(prefix)
+    for i in range(len(rows)):
+        if i in header_rows or i == banner_row or not any(rows[i][0]):
+            continue
+        rendered = _render_row(rows[i][0])
+        # A single row longer than the budget (e.g. a long clause in one cell) is split, header repeated.
+        pieces = _split_long_text(rendered, max_chars - len(prefix) - 1) if len(prefix) + len(rendered) + 1 > max_chars else [rendered]
+        for piece in pieces:
+            if group and size + len(piece) + 1 > max_chars:
+                flush()
+                size = len(prefix)
+            group.append((i, piece))
+            size += len(piece) + 1
+    flush()
+    if not chunks and header:
+        chunks.append(LCDocument(page_content=header, metadata={**base_metadata, "row_start": 0, "row_end": 0}))
+    return chunks
+
+
+# --- Public API ---
+def iter_docx_chunks(source, source_name: str, max_chars: int = DEFAULT_MAX_CHARS):
+    """Yields LangChain documents in reading order from a path, bytes or binary file object."""
+    document = Document(io.BytesIO(source) if isinstance(source, bytes) else source)
+    heading_ids, toc_ids = _classify_styles(document)
+    section, parts, table_index = None, [], 0
+
+    def flush():
+        if not parts or parts == [section]:
+            parts.clear()
+            return None  # A heading with nothing under it yet; the section title still prefixes what follows.
+        text = "\n".join(parts)
+        if section and parts[0] != section:
+            text = f"{section}\n{text}"
+        parts.clear()
+        return LCDocument(page_content=text, metadata={"source_document": source_name, "chunk_type": "text", "section": section})
+
+    for element in _iter_block_elements(document.element.body):
+        if element.tag == _TBL:
+            pending = flush()
+            if pending is not None:
+                yield pending
+            yield from _table_chunks(element, table_index, section, source_name, max_chars)
+            table_index += 1
+            continue
+        content = _text_of(element)
+        if not content:
+            continue
+        p_pr = element.find(_PPR)
+        style = p_pr.find(_PSTYLE) if p_pr is not None else None
+        style_id = style.get(_VAL) if style is not None else None
+        if style_id in toc_ids:
+            continue  # Table-of-contents lines only repeat the headings, with page numbers.
+        if style_id in heading_ids and len(content) <= MAX_HEADING_CHARS:
+            pending = flush()
+            if pending is not None:
+                yield pending
+            section = content
+        # flush() prefixes the section title when the chunk doesn't start with it; budget for that line.
+        title_chars = len(section) + 1 if section and content != section else 0
+        pieces = _split_long_text(content, max_chars - title_chars) if len(content) + title_chars > max_chars else [content]
+        for piece in pieces:
+            if parts and sum(len(p) + 1 for p in parts) + len(piece) + (title_chars if parts[0] != section else 0) > max_chars:
+                pending = flush()
+                if pending is not None:
+                    yield pending
+            parts.append(piece)
+    pending = flush()
+    if pending is not None:
+        yield pending
+
+
+def load_docx_chunks(source, source_name: str, max_chars: int = DEFAULT_MAX_CHARS) -> list:
+    return list(iter_docx_chunks(source, source_name, max_chars))
+
+
+# --- Process pool for batches (parsing is CPU-bound, so threads don't help) ---
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: callers (the pipeline, Streamlit) are multi-threaded.
+            _process_pool = ProcessPoolExecutor(max_workers=max(1, DOCX_PROCESS_WORKERS), mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+
+def load_docx_chunks_in_pool(source, source_name: str, max_chars: int = DEFAULT_MAX_CHARS) -> list:
+    """load_docx_chunks on the shared process pool, so concurrent callers (e.g. the indexing
+    pipeline's worker threads) parse in parallel. Runs inline when only one worker is configured."""
+    if DOCX_PROCESS_WORKERS <= 1:
+        return load_docx_chunks(source, source_name, max_chars)
+    return _get_process_pool().submit(load_docx_chunks, source, source_name, max_chars).result()
+
+
+def load_docx_batch(items, max_chars: int = DEFAULT_MAX_CHARS):
+    """Parses (name, path_or_bytes) pairs on the process pool; yields (name, chunks) as each finishes."""
+    items = list(items)
+    if DOCX_PROCESS_WORKERS <= 1 or len(items) < 2:
+        for name, source in items:
+            yield name, load_docx_chunks(source, name, max_chars)
+        return
+    pool = _get_process_pool()
+    futures = {pool.submit(load_docx_chunks, source, name, max_chars): name for name, source in items}
+    for future in as_completed(futures):
+        yield futures[future], future.result()
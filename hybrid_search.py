@@ -0,0 +1,112 @@
+# hybrid_search.py
+"""Local BM25 keyword index over chunks, and reciprocal-rank fusion with vector results.
+
+Tender questions often hinge on exact tokens ("RFB 3059-2024", "B-BBEE Level 2", clause 4.2.1)
+that embeddings blur; the lexical side catches those without a network round trip.
+"""
+
+import os
+import re
+import gzip
+import json
+import math
+import heapq
+import hashlib
+from array import array
+from langchain_core.documents import Document as LCDocument
+
+# Keeps codes like "3059-2024", "b-bbee" and "4.2.1" whole; their parts are indexed as well.
+_TOKEN_PATTERN = re.compile(r"[0-9a-z]+(?:[-./][0-9a-z]+)*")
+_PART_SPLIT = re.compile(r"[-./]")
+RRF_K = 60
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(str(text).casefold()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in _PART_SPLIT.split(token) if len(part) > 1 or part.isdigit())
+    return tokens
+
+
+def document_identity(doc: LCDocument) -> str:
+    """Stable identity of a chunk across retrievers (same source and text means the same chunk)."""
+    source = doc.metadata.get("source_document", "")
+    return hashlib.sha1(f"{source}\x1f{doc.page_content}".encode("utf-8")).hexdigest()
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunks. Postings are kept as compact unsigned int arrays."""
+
+    def __init__(self, documents: list, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = list(documents)
+        self._doc_lengths = array("I")
+        postings = {}
+        for doc_id, doc in enumerate(self.documents):
+            counts = {}
+            for token in tokenize(doc.page_content):
+                counts[token] = counts.get(token, 0) + 1
+            self._doc_lengths.append(sum(counts.values()))
+            for token, count in counts.items():
+                postings.setdefault(token, []).append((doc_id, count))
+        self._postings = {token: (array("I", (d for d, _ in entries)), array("I", (c for _, c in entries)))
+                          for token, entries in postings.items()}
+        self._avg_length = (sum(self._doc_lengths) / len(self._doc_lengths)) if self._doc_lengths else 0.0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _idf(self, document_frequency: int) -> float:
+        return math.log(1 + (len(self.documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, k: int, source_document: str = None) -> list:
+        """Top-k (document, score) pairs, optionally restricted to one source_document."""
+        scores = {}
+        for token in set(tokenize(query)):
+            entry = self._postings.get(token)
+            if entry is None:
+                continue
+            doc_ids, term_counts = entry
+            idf = self._idf(len(doc_ids))
+            for doc_id, tf in zip(doc_ids, term_counts):
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / (self._avg_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        if source_document:
+            scores = {d: s for d, s in scores.items() if self.documents[d].metadata.get("source_document") == source_document}
+        return [(self.documents[d], score) for d, score in heapq.nlargest(k, scores.items(), key=lambda item: item[1])]
+
+    def documents_for_source(self, source_document: str) -> list:
+        return [doc for doc in self.documents if doc.metadata.get("source_document") == source_document]
+
+    # --- Persistence (the chunks are stored; postings are rebuilt on load) ---
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump([{"page_content": d.page_content, "metadata": d.metadata} for d in self.documents], f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls([LCDocument(page_content=d["page_content"], metadata=d["metadata"]) for d in json.load(f)])
+
+
+def reciprocal_rank_fusion(ranked_lists: list, k: int, rrf_k: int = RRF_K, with_scores: bool = False) -> list:
+    """Merges ranked document lists by sum of 1 / (rrf_k + rank); duplicates across lists reinforce each other.
+
+    Returns documents, or (document, fused_score) pairs when with_scores is set.
+    """
+    scores, documents = {}, {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            identity = document_identity(doc)
+            documents.setdefault(identity, doc)
+            scores[identity] = scores.get(identity, 0.0) + 1.0 / (rrf_k + rank)
+    best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+    if with_scores:
+        return [(documents[identity], score) for identity, score in best]
+    return [documents[identity] for identity, _ in best]
@@ -0,0 +1,327 @@
+# index_pipeline.py
+"""Incremental indexing of tender documents into Azure AI Search.
+
+    python index_pipeline.py                       # tenders from the Blob Storage container
+    python index_pipeline.py --source-dir assets   # a local directory stands in for Blob Storage
+    python index_pipeline.py --force --prune       # re-process everything, drop documents no longer in the source
+
+A pre-computed layout result named after its document (e.g. `rfp_b4a.pdf.json`) is indexed in place
+of that document, and every layout result fetched from Form Recognizer is cached by content hash, so
+re-indexing never repeats the DocumentAnalysisClient call.
+
+Only documents whose content hash differs from the manifest are extracted, chunked, embedded and
+uploaded. The manifest (rag_core_turbo.INDEX_MANIFEST_PATH) is what the UI lists as indexed files.
+"""
+
+import os
+import io
+import json
+import time
+import hashlib
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+load_dotenv()
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobServiceClient
+from azure.search.documents import SearchClient
+from azure.search.documents.indexes import SearchIndexClient
+from azure.search.documents.indexes.models import (
+    SearchIndex, SearchField, SearchFieldDataType,
+    SimpleField, SearchableField, VectorSearch,
+    HnswAlgorithmConfiguration, VectorSearchProfile
+)
+from azure.ai.formrecognizer import DocumentAnalysisClient
+from langchain_core.documents import Document as LCDocument
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+import rag_core_turbo
+from layout_loader import load_layout_chunks
+from docx_loader import load_docx_chunks_in_pool
+from hybrid_search import BM25Index
+
+# --- Configuration ---
+AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+AZURE_STORAGE_CONTAINER_NAME = os.getenv("AZURE_STORAGE_CONTAINER_NAME")
+AZURE_FORM_RECOGNIZER_ENDPOINT = os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT")
+AZURE_FORM_RECOGNIZER_KEY = os.getenv("AZURE_FORM_RECOGNIZER_KEY")
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+LAYOUT_RESULT_EXTENSIONS = tuple(f"{ext}.json" for ext in SUPPORTED_EXTENSIONS)
+LAYOUT_CACHE_DIR = os.path.join(rag_core_turbo.RAG_CACHE_DIR, "layout")
+DOWNLOAD_MAX_WORKERS = int(os.getenv("INDEX_DOWNLOAD_MAX_WORKERS", "8"))
+DOCUMENT_MAX_WORKERS = int(os.getenv("INDEX_DOCUMENT_MAX_WORKERS", "3"))
+UPLOAD_BATCH_SIZE = int(os.getenv("INDEX_UPLOAD_BATCH_SIZE", "200"))
+UPLOAD_MAX_WORKERS = int(os.getenv("INDEX_UPLOAD_MAX_WORKERS", "4"))
+VECTOR_PROFILE_NAME = "rfp-vector-profile"
+HNSW_CONFIG_NAME = "rfp-hnsw"
+
+
+# --- Sources: Blob Storage or a local directory ---
+def is_layout_result(name: str) -> bool:
+    return name.lower().endswith(LAYOUT_RESULT_EXTENSIONS)
+
+
+def indexed_name(name: str) -> str:
+    """Name a source file is indexed (and filtered) under; layout results index as their document."""
+    return name[:-len(".json")] if is_layout_result(name) else name
+
+
+def _select_source_files(names) -> list:
+    """Supported files, with a pre-computed layout result replacing the raw document it describes."""
+    names = [n for n in names if n.lower().endswith(SUPPORTED_EXTENSIONS + LAYOUT_RESULT_EXTENSIONS)]
+    layout_backed = {indexed_name(n) for n in names if is_layout_result(n)}
+    return sorted(n for n in names if is_layout_result(n) or n not in layout_backed)
+
+
+def blob_source(connection_string: str = AZURE_STORAGE_CONNECTION_STRING, container_name: str = AZURE_STORAGE_CONTAINER_NAME):
+    """Returns (names, fetch_bytes) for every supported blob in the container."""
+    if not all([connection_string, container_name]):
+        raise ValueError("AZURE_STORAGE_CONNECTION_STRING and AZURE_STORAGE_CONTAINER_NAME must be set (or use --source-dir).")
+    container_client = BlobServiceClient.from_connection_string(connection_string).get_container_client(container_name)
+    names = _select_source_files(blob.name for blob in container_client.list_blobs())
+    return names, lambda name: container_client.download_blob(name).readall()
+
+
+def directory_source(directory: str):
+    """Returns (names, fetch_bytes) for every supported file directly inside directory."""
+    names = _select_source_files(f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f)))
+
+    def fetch_bytes(name):
+        with open(os.path.join(directory, name), "rb") as f:
+            return f.read()
+    return names, fetch_bytes
+
+
+def download_documents(names: list, fetch_bytes, max_workers: int = DOWNLOAD_MAX_WORKERS):
+    """Yields (name, bytes) as concurrent downloads complete. Failed downloads are reported and skipped."""
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="index-download") as executor:
+        futures = {executor.submit(fetch_bytes, name): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                yield name, future.result()
+            except Exception as e:
+                print(f"❌ Failed to download '{name}': {e}")
+
+
+# --- Manifest ---
+def save_index_manifest(manifest: dict, path: str = None):
+    path = path or rag_core_turbo.INDEX_MANIFEST_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    manifest["updated_at"] = time.time()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def document_key(name: str) -> str:
+    # Azure AI Search keys only allow letters, digits, '_', '-' and '='.
+    return hashlib.sha1(name.encode("utf-8")).hexdigest()
+
+
+# --- Layout extraction ---
+def get_layout_client():
+    if not all([AZURE_FORM_RECOGNIZER_ENDPOINT, AZURE_FORM_RECOGNIZER_KEY]):
+        return None
+    return DocumentAnalysisClient(endpoint=AZURE_FORM_RECOGNIZER_ENDPOINT, credential=AzureKeyCredential(AZURE_FORM_RECOGNIZER_KEY))
+
+
+def extract_chunks(name: str, file_bytes: bytes, content_hash: str, layout_client=None) -> list:
+    """Structure-aware chunks from a supplied layout result, python-docx for DOCX, or a PDF layout
+    result (cached or freshly analyzed); local text parsing otherwise."""
+    if is_layout_result(name):
+        return load_layout_chunks(file_bytes, indexed_name(name))
+    if name.lower().endswith(".docx"):
+        # python-docx already sees the headings and table structure; no layout call needed.
+        return load_docx_chunks_in_pool(file_bytes, name)
+    cached_layout_path = os.path.join(LAYOUT_CACHE_DIR, f"{content_hash}.json")
+    if os.path.exists(cached_layout_path):
+        print(f"Reusing cached layout for '{name}'")
+        return load_layout_chunks(cached_layout_path, name)
+    if layout_client is not None:
+        result = layout_client.begin_analyze_document("prebuilt-layout", document=file_bytes).result()
+        os.makedirs(LAYOUT_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cached_layout_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result.to_dict(), f)
+        os.replace(tmp_path, cached_layout_path)
+        return load_layout_chunks(cached_layout_path, name)
+    return chunk_pages(extract_pages_locally(name, file_bytes))
+
+
+def extract_pages_locally(name: str, file_bytes: bytes) -> list:
+    """One LangChain document per PDF page, for when no layout result is available."""
+    from pypdf import PdfReader
+    reader = PdfReader(io.BytesIO(file_bytes))
+    return [LCDocument(page_content=page.extract_text() or "", metadata={"source_document": name, "page": i + 1})
+            for i, page in enumerate(reader.pages)]
+
+
+def chunk_pages(pages: list) -> list:
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(pages)
+    return [chunk for chunk in chunks if chunk.page_content.strip()]
+
+
+# --- Azure AI Search ---
+def ensure_search_index(index_client: SearchIndexClient, index_name: str, dimensions: int):
+    """Creates the index with the fields AzureSearch and the source_document filter expect, if it is missing."""
+    try:
+        index_client.get_index(index_name)
+        return
+    except ResourceNotFoundError:
+        pass
+    print(f"Creating Azure AI Search index '{index_name}' ({dimensions} dimensions)")
+    fields = [
+        SimpleField(name="id", type=SearchFieldDataType.String, key=True, filterable=True),
+        SearchableField(name="content", type=SearchFieldDataType.String),
+        SearchField(name="content_vector", type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+                    searchable=True, vector_search_dimensions=dimensions, vector_search_profile_name=VECTOR_PROFILE_NAME),
+        SearchableField(name="metadata", type=SearchFieldDataType.String),
+        SimpleField(name="source_document", type=SearchFieldDataType.String, filterable=True, facetable=True),
+        SimpleField(name="content_hash", type=SearchFieldDataType.String, filterable=True),
+    ]
+    vector_search = VectorSearch(
+        algorithms=[HnswAlgorithmConfiguration(name=HNSW_CONFIG_NAME)],
+        profiles=[VectorSearchProfile(name=VECTOR_PROFILE_NAME, algorithm_configuration_name=HNSW_CONFIG_NAME)],
+    )
+    index_client.create_index(SearchIndex(name=index_name, fields=fields, vector_search=vector_search))
+
+
+def upload_in_batches(search_client: SearchClient, documents: list, batch_size: int = UPLOAD_BATCH_SIZE, max_workers: int = UPLOAD_MAX_WORKERS) -> int:
+    """merge_or_upload in concurrent batches; raises if any document is rejected."""
+    batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="index-upload") as executor:
+        for results in executor.map(search_client.merge_or_upload_documents, batches):
+            failed.extend(r.key for r in results if not r.succeeded)
+    if failed:
+        raise RuntimeError(f"{len(failed)} chunk(s) were rejected by Azure AI Search, e.g. {failed[:3]}")
+    return len(documents)
+
+
+def delete_chunks(search_client: SearchClient, name: str, start: int, stop: int):
+    """Removes chunk ids [start, stop) of a document, i.e. the tail left over when it shrank or was removed."""
+    ids = [{"id": f"{document_key(name)}-{i}"} for i in range(start, stop)]
+    for i in range(0, len(ids), UPLOAD_BATCH_SIZE):
+        search_client.delete_documents(ids[i:i + UPLOAD_BATCH_SIZE])
+
+
+# --- Pipeline ---
+def process_document(name: str, file_bytes: bytes, content_hash: str, previous_chunk_count: int, embeddings, search_client, layout_client):
+    """Indexes one source file under indexed_name(name); returns (manifest entry, chunks)."""
+    started = time.perf_counter()
+    chunks = extract_chunks(name, file_bytes, content_hash, layout_client)
+    name = indexed_name(name)
+    texts = [chunk.page_content for chunk in chunks]
+    vectors = rag_core_turbo.embed_texts_in_batches(texts, embeddings)
+    key = document_key(name)
+    upload_in_batches(search_client, [{
+        "id": f"{key}-{i}",
+        "content": chunk.page_content,
+        "content_vector": vector,
+        "metadata": json.dumps({**chunk.metadata, "chunk_index": i}),
+        "source_document": name,
+        "content_hash": content_hash,
+    } for i, (chunk, vector) in enumerate(zip(chunks, vectors))])
+    if previous_chunk_count > len(chunks):
+        delete_chunks(search_client, name, len(chunks), previous_chunk_count)
+    print(f"✅ Indexed '{name}': {len(chunks)} chunks in {time.perf_counter() - started:.1f}s")
+    return {"content_hash": content_hash, "chunk_count": len(chunks), "indexed_at": time.time()}, chunks
+
+
+def update_lexical_index(replaced_chunks: dict, removed: set, path: str = None):
+    """Rewrites the local BM25 index: chunks of re-indexed or removed documents are swapped out, the rest kept."""
+    path = path or rag_core_turbo.LEXICAL_INDEX_PATH
+    existing = BM25Index.load(path).documents if os.path.exists(path) else []
+    dropped = set(replaced_chunks) | set(removed)
+    kept = [doc for doc in existing if doc.metadata.get("source_document") not in dropped]
+    lexical_index = BM25Index(kept + [chunk for chunks in replaced_chunks.values() for chunk in chunks])
+    lexical_index.save(path)
+    print(f"✅ Lexical index updated: {len(lexical_index)} chunks")
+
+
+def run_pipeline(names: list, fetch_bytes, force: bool = False, prune: bool = False) -> dict:
+    """Indexes new/changed documents and publishes the manifest. Returns a summary dict."""
+    embeddings = rag_core_turbo.get_embeddings_client()
+    if embeddings is None:
+        raise RuntimeError("Embedding client is not initialized; check the Azure OpenAI environment variables.")
+    if not all([rag_core_turbo.AZURE_AI_SEARCH_ENDPOINT, rag_core_turbo.AZURE_AI_SEARCH_KEY, rag_core_turbo.AZURE_AI_SEARCH_INDEX_NAME]):
+        raise RuntimeError("Azure AI Search environment variables are missing.")
+    credential = AzureKeyCredential(rag_core_turbo.AZURE_AI_SEARCH_KEY)
+    index_name = rag_core_turbo.AZURE_AI_SEARCH_INDEX_NAME
+    ensure_search_index(SearchIndexClient(endpoint=rag_core_turbo.AZURE_AI_SEARCH_ENDPOINT, credential=credential),
+                        index_name, rag_core_turbo.EMBEDDING_DIMENSIONS or 1536)
+    search_client = SearchClient(endpoint=rag_core_turbo.AZURE_AI_SEARCH_ENDPOINT, index_name=index_name, credential=credential)
+    layout_client = get_layout_client()
+    if layout_client is None:
+        print("⚠️ Form Recognizer is not configured; falling back to local PDF/DOCX text extraction.")
+
+    manifest = rag_core_turbo.load_index_manifest()
+    documents = manifest.setdefault("documents", {})
+    manifest_lock = threading.Lock()
+    new_chunks = {}
+    if documents and not force and not os.path.exists(rag_core_turbo.LEXICAL_INDEX_PATH):
+        print("⚠️ No lexical index yet; unchanged documents get keyword search only after a --force run.")
+    summary = {"indexed": [], "unchanged": [], "failed": [], "removed": []}
+
+    def index_one(name, file_bytes, content_hash):
+        try:
+            entry, chunks = process_document(name, file_bytes, content_hash, documents.get(indexed_name(name), {}).get("chunk_count", 0),
+                                     embeddings, search_client, layout_client)
+            with manifest_lock:
+                documents[indexed_name(name)] = entry
+                new_chunks[indexed_name(name)] = chunks
+                summary["indexed"].append(indexed_name(name))
+        except Exception as e:
+            print(f"❌ Failed to index '{name}': {e}")
+            traceback.print_exc()
+            with manifest_lock:
+                summary["failed"].append(indexed_name(name))
+
+    with ThreadPoolExecutor(max_workers=max(1, DOCUMENT_MAX_WORKERS), thread_name_prefix="index-document") as executor:
+        futures = []
+        for name, file_bytes in download_documents(names, fetch_bytes):
+            content_hash = rag_core_turbo.hash_file_bytes(file_bytes)
+            if not force and documents.get(indexed_name(name), {}).get("content_hash") == content_hash:
+                summary["unchanged"].append(indexed_name(name))
+                continue
+            futures.append(executor.submit(index_one, name, file_bytes, content_hash))
+        for future in futures:
+            future.result()
+
+    if prune:
+        source_names = {indexed_name(n) for n in names}
+        for name in [n for n in documents if n not in source_names]:
+            delete_chunks(search_client, name, 0, documents[name].get("chunk_count", 0))
+            del documents[name]
+            summary["removed"].append(name)
+
+    manifest["index_name"] = index_name
+    save_index_manifest(manifest)
+    if summary["indexed"] or summary["removed"]:
+        update_lexical_index(new_chunks, summary["removed"])
+        rag_core_turbo.bump_index_version()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally index tender documents into Azure AI Search.")
+    parser.add_argument("--source-dir", help="Index files from this local directory instead of Blob Storage.")
+    parser.add_argument("--force", action="store_true", help="Re-process documents even if their content hash is unchanged.")
+    parser.add_argument("--prune", action="store_true", help="Remove indexed documents that are no longer in the source.")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    names, fetch_bytes = directory_source(args.source_dir) if args.source_dir else blob_source()
+    print(f"--- Indexing {len(names)} document(s) from {args.source_dir or AZURE_STORAGE_CONTAINER_NAME} ---")
+    summary = run_pipeline(names, fetch_bytes, force=args.force, prune=args.prune)
+    print(f"--- Done in {time.perf_counter() - started:.1f}s: {len(summary['indexed'])} indexed, "
+          f"{len(summary['unchanged'])} unchanged, {len(summary['removed'])} removed, {len(summary['failed'])} failed ---")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
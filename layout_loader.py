@@ -0,0 +1,371 @@
+# layout_loader.py
+"""Structure-aware chunks from pre-computed Form Recognizer / Document Intelligence layout results.
+
+Accepts both the REST `analyzeResult` JSON (camelCase, optionally wrapped in the operation
+envelope) and the SDK's `AnalyzeResult.to_dict()` output (snake_case). The file is scanned as a
+stream: the large `pages`/`words` arrays and the top-level `content` string are skipped without
+being materialised, and `tables` and `paragraphs` are decoded one item at a time.
+"""
+
+import io
+import os
+import re
+import json
+import codecs
+import bisect
+from langchain_core.documents import Document as LCDocument
+
+DEFAULT_MAX_CHARS = 1000
+SKIPPED_PARAGRAPH_ROLES = {"pageHeader", "pageFooter", "pageNumber"}
+HEADING_ROLES = {"title", "sectionHeading"}
+_READ_SIZE = 64 * 1024
+
+
+def _cp1252_fallback(error: UnicodeDecodeError):
+    # Some exported results are not valid UTF-8 (e.g. a raw 0xB7 bullet); read those bytes as cp1252.
+    return error.object[error.start:error.end].decode("cp1252", errors="replace"), error.end
+
+
+codecs.register_error("layout_cp1252_fallback", _cp1252_fallback)
+
+
+def _snake(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def _get(obj: dict, camel_name: str, default=None):
+    value = obj.get(camel_name)
+    if value is None:
+        value = obj.get(_snake(camel_name), default)
+    return value
+
+
+# --- Streaming JSON scanner ---
+class _JSONStream:
+    """Pull scanner over a text stream that can skip values and decode one array item at a time."""
+
+    _STRUCTURAL = re.compile(r'["{}\[\]]')
+    _SCALAR_END = re.compile(r"[,}\]]")
+    _STRING_SPECIAL = re.compile(r'["\\]')
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._fp.read(_READ_SIZE)
+        if not data:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed layout JSON: expected {char!r}, found {found!r}")
+        self._pos += 1
+
+    def read_string(self) -> str:
+        self.expect('"')
+        while True:
+            try:
+                value, end = json.decoder.scanstring(self._buf, self._pos)
+                self._pos = end
+                return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+    def _skip_string(self):
+        """Like read_string, but only finds the closing quote instead of decoding the value."""
+        self.expect('"')
+        while True:
+            match = self._STRING_SPECIAL.search(self._buf, self._pos)
+            if match is None or (match.group() == "\\" and match.end() >= len(self._buf)):
+                if not self._fill():
+                    raise ValueError("Malformed layout JSON: unterminated string")
+                continue
+            if match.group() == '"':
+                self._pos = match.end()
+                return
+            self._pos = match.end() + 1  # Skip the escaped character.
+
+    def skip_value(self):
+        """Advances past the next value without building it."""
+        first = self.peek()
+        if first not in "[{\"":
+            # Scalar: consume up to the next delimiter.
+            while True:
+                match = self._SCALAR_END.search(self._buf, self._pos)
+                if match:
+                    self._pos = match.start()
+                    return
+                self._pos = len(self._buf)
+                if not self._fill():
+                    return
+        if first == '"':
+            self._skip_string()
+            return
+        depth = 0
+        while True:
+            match = self._STRUCTURAL.search(self._buf, self._pos)
+            if match is None:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise ValueError("Malformed layout JSON: unexpected end of file")
+                continue
+            char = match.group()
+            self._pos = match.end()
+            if char == '"':
+                self._pos -= 1
+                self._skip_string()
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def decode_value(self):
+        """Decodes the next container value (object/array); only the item itself is held in memory."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                self._pos = end
+                return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+    def iter_object_keys(self):
+        """Yields each key of the object at the cursor; the caller must consume the value before the next step."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_string()
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Malformed layout JSON: unexpected {separator!r}")
+
+    def iter_array_items(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.decode_value()
+            separator = self.peek()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Malformed layout JSON: unexpected {separator!r}")
+
+
+def _open_text(source):
+    """Text stream over a path, bytes or seekable binary file object (rewound, and left open)."""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "r", encoding="utf-8", errors="layout_cp1252_fallback"), None
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    source.seek(0)
+    return io.TextIOWrapper(source, encoding="utf-8", errors="layout_cp1252_fallback"), source
+
+
+def iter_analyze_result_items(source, array_name: str):
+    """Streams the items of analyzeResult[array_name] from a path, bytes or binary file object."""
+    wrapper_keys = {"analyzeResult", "analyze_result"}
+    fp, borrowed = _open_text(source)
+    try:
+        stream = _JSONStream(fp)
+
+        def walk_object():
+            for key in stream.iter_object_keys():
+                if key == array_name and stream.peek() == "[":
+                    yield from stream.iter_array_items()
+                elif key in wrapper_keys and stream.peek() == "{":
+                    yield from walk_object()
+                else:
+                    stream.skip_value()
+        yield from walk_object()
+    finally:
+        if borrowed is None:
+            fp.close()
+        else:
+            fp.detach()
+
+
+# --- Helpers over decoded items ---
+def _spans(item: dict) -> list:
+    return [{"offset": span["offset"], "length": span["length"]} for span in (_get(item, "spans") or [])]
+
+
+def _pages(item: dict) -> list:
+    return sorted({_get(region, "pageNumber") for region in (_get(item, "boundingRegions") or []) if _get(region, "pageNumber")})
+
+
+def _split_long_text(text: str, max_chars: int) -> list:
+    parts, current = [], ""
+    for word in text.split(" "):
+        if current and len(current) + 1 + len(word) > max_chars:
+            parts.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        parts.append(current)
+    return parts
+
+
+# --- Tables ---
+def _table_chunks(table: dict, table_index: int, source_name: str, max_chars: int) -> list:
+    """One chunk per group of whole rows; column-header rows are repeated at the top of every chunk."""
+    rows, header_rows, pages = {}, set(), set()
+    for cell in _get(table, "cells") or []:
+        row, column = _get(cell, "rowIndex"), _get(cell, "columnIndex")
+        rows.setdefault(row, {})[column] = " ".join(str(_get(cell, "content") or "").split())
+        if _get(cell, "kind") == "columnHeader":
+            header_rows.add(row)
+        pages.update(_pages(cell))
+    column_count = _get(table, "columnCount") or (max((max(r) for r in rows.values()), default=-1) + 1)
+
+    def render(row_index):
+        cells = rows.get(row_index, {})
+        return "| " + " | ".join(cells.get(c, "") for c in range(column_count)) + " |"
+
+    header = "\n".join(render(r) for r in sorted(header_rows))
+    body_rows = [r for r in sorted(rows) if r not in header_rows and any(rows[r].values())]
+    spans = _spans(table)
+    base_metadata = {"source_document": source_name, "chunk_type": "table", "table_index": table_index,
+                     "page_numbers": sorted(pages) or _pages(table), "spans": spans}
+    chunks, group = [], []
+
+    def flush():
+        if not group:
+            return
+        text = "\n".join(([header] if header else []) + [render(r) for r in group])
+        chunks.append(LCDocument(page_content=text, metadata={**base_metadata, "row_start": group[0], "row_end": group[-1]}))
+        group.clear()
+
+    size = len(header)
+    for row_index in body_rows:
+        row_len = len(render(row_index)) + 1
+        if group and size + row_len > max_chars:
+            flush()
+            size = len(header)
+        group.append(row_index)
+        size += row_len
+    flush()
+    if not chunks and header:
+        chunks.append(LCDocument(page_content=header, metadata={**base_metadata, "row_start": 0, "row_end": 0}))
+    return chunks
+
+
+# --- Public API ---
+def iter_layout_chunks(source, source_name: str, max_chars: int = DEFAULT_MAX_CHARS):
+    """Yields LangChain documents in reading order: paragraphs grouped within their section, and
+    tables as whole-row groups, each with page numbers, spans and section title in metadata.
+
+    The file is read twice (tables, then paragraphs) so peak memory is bounded by the tables'
+    chunk text, not the size of the analyze result.
+    """
+    tables = []  # (start_offset, end_offset, chunks) in document order
+    for table_index, table in enumerate(iter_analyze_result_items(source, "tables")):
+        spans = _spans(table)
+        if not spans:
+            continue
+        start = min(s["offset"] for s in spans)
+        end = max(s["offset"] + s["length"] for s in spans)
+        tables.append((start, end, _table_chunks(table, table_index, source_name, max_chars)))
+    tables.sort(key=lambda t: t[0])
+    table_starts = [t[0] for t in tables]
+    next_table = 0
+
+    section, parts, meta = None, [], {"pages": set(), "spans": []}
+
+    def flush():
+        if not parts:
+            return None
+        text = "\n".join(parts)
+        if section and parts[0] != section:
+            text = f"{section}\n{text}"
+        chunk = LCDocument(page_content=text, metadata={
+            "source_document": source_name, "chunk_type": "text", "section": section,
+            "page_numbers": sorted(meta["pages"]), "spans": list(meta["spans"])})
+        parts.clear()
+        meta["pages"].clear()
+        meta["spans"].clear()
+        return chunk
+
+    def tag_section(chunks):
+        for chunk in chunks:
+            chunk.metadata["section"] = section
+        return chunks
+
+    for paragraph in iter_analyze_result_items(source, "paragraphs"):
+        spans = _spans(paragraph)
+        offset = spans[0]["offset"] if spans else None
+        if offset is not None:
+            # Emit every table that starts before this paragraph, in reading order.
+            while next_table < len(tables) and tables[next_table][0] <= offset:
+                pending = flush()
+                if pending is not None:
+                    yield pending
+                yield from tag_section(tables[next_table][2])
+                next_table += 1
+            i = bisect.bisect_right(table_starts, offset) - 1
+            if i >= 0 and offset < tables[i][1]:
+                continue  # Cell text; already covered by the table's chunks.
+        role = _get(paragraph, "role")
+        if role in SKIPPED_PARAGRAPH_ROLES:
+            continue
+        content = " ".join(str(_get(paragraph, "content") or "").split())
+        if not content:
+            continue
+        if role in HEADING_ROLES:
+            pending = flush()
+            if pending is not None:
+                yield pending
+            section = content
+        pieces = _split_long_text(content, max_chars) if len(content) > max_chars else [content]
+        for piece in pieces:
+            if parts and sum(len(p) + 1 for p in parts) + len(piece) > max_chars:
+                pending = flush()
+                if pending is not None:
+                    yield pending
+            parts.append(piece)
+            meta["pages"].update(_pages(paragraph))
+            meta["spans"].extend(spans)
+    pending = flush()
+    if pending is not None:
+        yield pending
+    for _, _, chunks in tables[next_table:]:
+        yield from tag_section(chunks)
+
+
+def load_layout_chunks(source, source_name: str, max_chars: int = DEFAULT_MAX_CHARS) -> list:
+    return list(iter_layout_chunks(source, source_name, max_chars))
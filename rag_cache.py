@@ -0,0 +1,421 @@
+# rag_cache.py
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from context_packer import count_tokens
+from rag_metrics import span, record_embedding_tokens
+
+# --- Configuration ---
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "2048"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Optional SQLite file shared by every Streamlit worker on the host; leave empty to keep the cache in-process only.
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+# Row cap for the SQLite file (oldest rows go first); 0 for no cap. Expired and excess rows are pruned
+# when the file is opened and after every EMBEDDING_CACHE_PRUNE_EVERY stored vectors.
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))
+EMBEDDING_CACHE_PRUNE_EVERY = int(os.getenv("EMBEDDING_CACHE_PRUNE_EVERY", "500"))
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used for cache keys."""
+    return " ".join(str(text).split()).casefold()
+
+
+def _hash_key(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+# --- In-process LRU with TTL eviction ---
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl_seconds."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, stored_at: float = None):
+        with self._lock:
+            self._entries[key] = (stored_at if stored_at is not None else time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# --- On-disk vector store shared across processes ---
+class SQLiteVectorStore:
+    """Float32 vectors keyed by hash, in a SQLite file (WAL mode so several workers can share it)."""
+
+    def __init__(self, path: str, ttl_seconds: float, max_rows: int = EMBEDDING_CACHE_MAX_ROWS,
+                 prune_every: int = EMBEDDING_CACHE_PRUNE_EVERY):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._writes_since_prune = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, stored_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_stored_at ON embeddings (stored_at)")
+        self._conn.commit()
+        self.prune()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT vector, stored_at FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector_bytes, stored_at = row
+        if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+            return None
+        return np.frombuffer(vector_bytes, dtype=np.float32), stored_at
+
+    def set_many(self, items):
+        now = time.time()
+        with self._lock:
+            rows = [(key, vector.tobytes(), now) for key, vector in items]
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, stored_at) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+            self._writes_since_prune += len(rows)
+            due = self.prune_every and self._writes_since_prune >= self.prune_every
+        if due:
+            self.prune()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def purge_expired(self):
+        if not self.ttl_seconds:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings WHERE stored_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+
+    def prune(self):
+        """Drops expired rows, then the oldest rows beyond max_rows."""
+        self.purge_expired()
+        with self._lock:
+            self._writes_since_prune = 0
+            if self.max_rows:
+                self._conn.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                                   (self.max_rows,))
+                self._conn.commit()
+
+
+# --- Caching wrapper around any LangChain embeddings client ---
+class CachedEmbeddings(Embeddings):
+    """Caches query embeddings by (deployment, normalized text).
+
+    Lookups go to the in-process LRU first, then the optional SQLite store. Document embeddings
+    pass straight through so bulk indexing does not evict the frequently repeated queries;
+    use prime_queries() to batch-embed known questions into the cache up front.
+    """
+
+    def __init__(self, inner: Embeddings, deployment_name: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = EMBEDDING_CACHE_TTL_SECONDS, disk_path: str = EMBEDDING_CACHE_PATH):
+        self.inner = inner
+        self.deployment_name = deployment_name or ""
+        self._memory = TTLCache(max_entries, ttl_seconds)
+        self._disk = None
+        if disk_path:
+            try:
+                self._disk = SQLiteVectorStore(disk_path, ttl_seconds)
+            except Exception as e:
+                print(f"⚠️ Embedding disk cache unavailable at '{disk_path}', using memory only: {e}")
+        self._stats_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "api_calls": 0, "miss_latency_s": 0.0}
+
+    def cache_key(self, text: str) -> str:
+        return _hash_key(self.deployment_name, normalize_text(text))
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def _lookup(self, key: str):
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._count(memory_hits=1)
+            return vector
+        if self._disk is not None:
+            try:
+                found = self._disk.get(key)
+            except Exception as e:
+                print(f"⚠️ Embedding disk cache read failed: {e}")
+                found = None
+            if found is not None:
+                vector, stored_at = found
+                self._memory.set(key, vector, stored_at=stored_at)
+                self._count(disk_hits=1)
+                return vector
+        return None
+
+    def _store(self, items):
+        for key, vector in items:
+            self._memory.set(key, vector)
+        if self._disk is not None:
+            try:
+                self._disk.set_many(items)
+            except Exception as e:
+                print(f"⚠️ Embedding disk cache write failed: {e}")
+
+    def embed_query(self, text: str) -> list:
+        key = self.cache_key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            started = time.perf_counter()
+            with span("embedding", texts=1):
+                vector = np.asarray(self.inner.embed_query(text), dtype=np.float32)
+            self._count(misses=1, api_calls=1, miss_latency_s=time.perf_counter() - started)
+            record_embedding_tokens(count_tokens(text), deployment=self.deployment_name)
+            self._store([(key, vector)])
+        return vector.tolist()
+
+    def prime_queries(self, texts: list) -> int:
+        """Embeds every uncached text in a single batched call. Returns how many were fetched."""
+        pending = {}
+        for text in texts:
+            key = self.cache_key(text)
+            if key not in pending and self._lookup(key) is None:
+                pending[key] = text
+        if not pending:
+            return 0
+        started = time.perf_counter()
+        with span("embedding", texts=len(pending)):
+            vectors = self.inner.embed_documents(list(pending.values()))
+        self._count(misses=len(pending), api_calls=1, miss_latency_s=time.perf_counter() - started)
+        record_embedding_tokens(sum(count_tokens(text) for text in pending.values()), deployment=self.deployment_name)
+        self._store([(key, np.asarray(vector, dtype=np.float32)) for key, vector in zip(pending.keys(), vectors)])
+        return len(pending)
+
+    def embed_documents(self, texts: list) -> list:
+        with span("embed_documents", texts=len(texts)):
+            vectors = self.inner.embed_documents(texts)
+        record_embedding_tokens(sum(count_tokens(text) for text in texts), deployment=self.deployment_name)
+        return vectors
+
+    def clear(self):
+        """Empties the in-process cache and the disk store, so the next lookups really call the embedder."""
+        self._memory.clear()
+        if self._disk is not None:
+            try:
+                self._disk.clear()
+            except Exception as e:
+                print(f"⚠️ Embedding disk cache clear failed: {e}")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        avg_miss_latency = stats["miss_latency_s"] / stats["api_calls"] if stats["api_calls"] else 0.0
+        stats.update({
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_enabled": self._disk is not None,
+            "estimated_saved_s": round(hits * avg_miss_latency, 3),
+            "miss_latency_s": round(stats["miss_latency_s"], 3),
+        })
+        return stats
+
+
+# --- Text results keyed by content (e.g. per-chunk map outputs of whole-document analysis) ---
+class TextResultCache:
+    """In-process LRU in front of an optional SQLite file, for LLM outputs that depend only on their key."""
+
+    def __init__(self, disk_path: str = "", max_entries: int = 4096, ttl_seconds: float = 30 * 24 * 3600):
+        self.ttl_seconds = ttl_seconds
+        self._memory = TTLCache(max_entries, ttl_seconds)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+        if disk_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+                self._conn = sqlite3.connect(disk_path, timeout=10, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)")
+                self._conn.commit()
+            except Exception as e:
+                print(f"⚠️ Result cache unavailable at '{disk_path}', using memory only: {e}")
+                self._conn = None
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        return _hash_key(*[str(part) for part in parts])
+
+    def get(self, key: str):
+        value = self._memory.get(key)
+        if value is None and self._conn is not None:
+            try:
+                with self._lock:
+                    row = self._conn.execute("SELECT value, stored_at FROM results WHERE key = ?", (key,)).fetchone()
+            except Exception as e:
+                print(f"⚠️ Result cache read failed: {e}")
+                row = None
+            if row is not None and not (self.ttl_seconds and time.time() - row[1] > self.ttl_seconds):
+                value = row[0]
+                self._memory.set(key, value, stored_at=row[1])
+        with self._lock:
+            self._stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, key: str, value: str):
+        self._memory.set(key, value)
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    self._conn.execute("INSERT OR REPLACE INTO results (key, value, stored_at) VALUES (?, ?, ?)", (key, value, time.time()))
+                    self._conn.commit()
+            except Exception as e:
+                print(f"⚠️ Result cache write failed: {e}")
+
+    def clear(self):
+        """Drops every stored result, on disk too."""
+        self._memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM results")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# --- Answer cache for perform_manual_rag_query ---
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Cosine similarity above which a differently worded question reuses a cached answer. Off (0) by
+# default: near-opposite questions ("closing date" / "opening date") can score above 0.97.
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0"))
+
+
+class AnswerCache:
+    """Caches final RAG answers (with their sources) per scope.
+
+    A scope bundles everything besides the question that determines the answer: the document
+    filter, the prompt version and the index/content version. Changing any of them simply misses,
+    so re-indexing invalidates without having to find the stale entries.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self._entries = TTLCache(max_entries, ttl_seconds)
+        self._vectors = {}  # scope -> OrderedDict(key -> unit float32 vector)
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_scope(*parts) -> str:
+        return _hash_key(*[str(part) for part in parts])
+
+    def _key(self, query: str, scope: str) -> str:
+        return _hash_key(scope, normalize_text(query))
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, query: str, scope: str, query_vector=None):
+        """Exact lookup on the normalized query; with query_vector, falls back to the closest cached question in scope."""
+        entry = self._entries.get(self._key(query, scope))
+        if entry is not None:
+            self._count("exact_hits")
+            return entry
+        if query_vector is not None and self.similarity_threshold > 0:
+            entry = self._most_similar(scope, query_vector)
+            if entry is not None:
+                self._count("similar_hits")
+                return entry
+        self._count("misses")
+        return None
+
+    def _most_similar(self, scope: str, query_vector):
+        with self._lock:
+            scoped = self._vectors.get(scope)
+            if not scoped:
+                return None
+            keys = list(scoped.keys())
+            matrix = np.stack(list(scoped.values()))
+        vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        similarities = matrix @ (vector / norm)
+        for index in np.argsort(similarities)[::-1]:
+            if similarities[index] < self.similarity_threshold:
+                break
+            entry = self._entries.get(keys[index])
+            if entry is not None:
+                return entry
+            with self._lock:  # Expired or evicted; forget its vector too.
+                scoped.pop(keys[index], None)
+        return None
+
+    def set(self, query: str, scope: str, answer: str, sources_for_ui: list, query_vector=None):
+        key = self._key(query, scope)
+        self._entries.set(key, {"answer": answer, "sources_for_ui": sources_for_ui})
+        if query_vector is None:
+            return
+        vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return
+        with self._lock:
+            scoped = self._vectors.setdefault(scope, OrderedDict())
+            scoped[key] = vector / norm
+            scoped.move_to_end(key)
+            while len(scoped) > self.max_entries:
+                scoped.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        with self._lock:
+            self._vectors.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["exact_hits"] + stats["similar_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["similar_hits"]) / lookups, 3) if lookups else 0.0
+        stats["entries"] = len(self._entries)
+        return stats
@@ -1,11 +1,19 @@
 # rag_core_turbo.py
 
+import time
+_IMPORT_STARTED_AT = time.perf_counter()
 import os
+import json
+import shutil
+import threading
+import random
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from dotenv import load_dotenv
 load_dotenv()
 import hashlib
 import traceback
 import tempfile
+_IMPORT_CHECKPOINTS = {"stdlib_and_dotenv": time.perf_counter()}
 from docx import Document
 from azure.core.credentials import AzureKeyCredential
 from azure.storage.blob import BlobServiceClient
@@ -17,16 +25,30 @@ from azure.search.documents.indexes.models import (
     HnswAlgorithmConfiguration, VectorSearchProfile
 )
 from azure.ai.formrecognizer import DocumentAnalysisClient
+_IMPORT_CHECKPOINTS["azure_sdks"] = time.perf_counter()
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.prompts import PromptTemplate
 from langchain_community.vectorstores.azuresearch import AzureSearch
+_IMPORT_CHECKPOINTS["langchain"] = time.perf_counter()
+from langchain_core.documents import Document as LCDocument
+from rag_cache import CachedEmbeddings, AnswerCache, TextResultCache, TTLCache
+from hybrid_search import BM25Index, reciprocal_rank_fusion
+from context_packer import CONTEXT_TOKEN_BUDGET, count_tokens, pack_context, truncate_to_tokens
+from docx_loader import load_docx_chunks
+from rag_metrics import (span, record_llm_tokens, start_metrics_exporters,
+                         QUERIES, CONTEXT_TOKENS, RATE_LIMIT_RETRIES, TIME_TO_FIRST_TOKEN)
 
 # --- Global Variables & Clients ---
+# Clients are created lazily by the get_* functions below; nothing here touches the network at import time.
 EMBEDDING_DIMENSIONS = 0
-embeddings_client = None
-llm = None
-vector_store_for_manual_rag = None
+_embeddings_client = None
+_llm = None
+_vector_store_for_manual_rag = None
+_client_init_errors = {}
+_embeddings_lock = threading.Lock()
+_llm_lock = threading.Lock()
+_vector_store_lock = threading.Lock()
 RFP_PROMPT = None
 
 # List of expected files in Blob Storage
@@ -36,69 +58,368 @@ rfp_files_expected_in_blob = [
     "Wits Tender 2025 04 ICT - Information Technology Service Management (ITSM) System Annexure B Returnable Schedule.docx"
 ]
 
-print("--- Initializing RAG Core Turbo Backend Components ---")
-
-# --- Initialize Embedding Client ---
-try:
-    AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-    AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-    AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
-    AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
-    if not all([AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_EMBEDDING_DEPLOYMENT]):
-        raise ValueError("One or more Azure OpenAI Embedding environment variables are missing.")
-    print(f"Attempting to use Azure OpenAI Embeddings: {AZURE_OPENAI_EMBEDDING_DEPLOYMENT}")
-    embeddings_client = AzureOpenAIEmbeddings(
-        azure_deployment=AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
-        openai_api_version=AZURE_OPENAI_API_VERSION,
-        azure_endpoint=AZURE_OPENAI_ENDPOINT,
-        api_key=AZURE_OPENAI_API_KEY
-    )
-    _ = embeddings_client.embed_query("test")
-    EMBEDDING_DIMENSIONS = 1536
-    print("✅ Successfully initialized Azure OpenAI Embeddings.")
-except Exception as e:
-    print(f"❌ CRITICAL ERROR initializing Azure OpenAI Embeddings: {e}")
-    embeddings_client = None
-
-# --- Initialize LLM Client ---
-try:
-    AZURE_OPENAI_CHAT_DEPLOYMENT = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT")
-    if not all([AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_CHAT_DEPLOYMENT]):
-        raise ValueError("One or more Azure OpenAI Chat environment variables are missing.")
-    print(f"Attempting to use Azure OpenAI Chat Model: {AZURE_OPENAI_CHAT_DEPLOYMENT}")
-    llm = AzureChatOpenAI(
-        azure_deployment=AZURE_OPENAI_CHAT_DEPLOYMENT,
-        openai_api_version=AZURE_OPENAI_API_VERSION,
-        azure_endpoint=AZURE_OPENAI_ENDPOINT,
-        api_key=AZURE_OPENAI_API_KEY,
-        temperature=0.1
-    )
-    _ = llm.invoke("hello")
-    print("✅ Successfully initialized Azure OpenAI Chat Model.")
-except Exception as e:
-    print(f"❌ CRITICAL ERROR initializing Azure OpenAI Chat Model: {e}")
-    llm = None
-
-# --- Initialize Vector Store Client (Azure AI Search) ---
-try:
-    AZURE_AI_SEARCH_ENDPOINT = os.getenv("AZURE_AI_SEARCH_ENDPOINT")
-    AZURE_AI_SEARCH_KEY = os.getenv("AZURE_AI_SEARCH_KEY")
-    AZURE_AI_SEARCH_INDEX_NAME = os.getenv("AZURE_AI_SEARCH_INDEX_NAME")
-    if all([AZURE_AI_SEARCH_ENDPOINT, AZURE_AI_SEARCH_KEY, AZURE_AI_SEARCH_INDEX_NAME, embeddings_client]):
-        print(f"Initializing Azure AI Search vector store for index: {AZURE_AI_SEARCH_INDEX_NAME}")
-        vector_store_for_manual_rag = AzureSearch(
-            azure_search_endpoint=AZURE_AI_SEARCH_ENDPOINT,
-            azure_search_key=AZURE_AI_SEARCH_KEY,
-            index_name=AZURE_AI_SEARCH_INDEX_NAME,
-            embedding_function=embeddings_client.embed_query,
-            vector_field_name="content_vector"
-        )
-        print("✅ Global vector store initialized successfully.")
+# --- Configuration (read once, cheap) ---
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
+AZURE_OPENAI_CHAT_DEPLOYMENT = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT")
+AZURE_AI_SEARCH_ENDPOINT = os.getenv("AZURE_AI_SEARCH_ENDPOINT")
+AZURE_AI_SEARCH_KEY = os.getenv("AZURE_AI_SEARCH_KEY")
+AZURE_AI_SEARCH_INDEX_NAME = os.getenv("AZURE_AI_SEARCH_INDEX_NAME")
+RAG_CACHE_DIR = os.getenv("RAG_CACHE_DIR", ".rfp_cache")
+INDEX_VERSION_PATH = os.path.join(RAG_CACHE_DIR, "index_version")
+INDEX_MANIFEST_PATH = os.getenv("INDEX_MANIFEST_PATH", os.path.join(RAG_CACHE_DIR, "index_manifest.json"))
+LEXICAL_INDEX_PATH = os.path.join(RAG_CACHE_DIR, "lexical_index.json.gz")
+UPLOAD_INDEX_CACHE_DIR = os.path.join(RAG_CACHE_DIR, "uploads")
+# Bump when upload parsing or chunking changes, so persisted upload indexes are rebuilt.
+UPLOAD_INDEX_VERSION = "2"  # 2: DOCX via docx_loader, PDF pages split 1000/200
+# Persisted upload indexes are evicted least-recently-used beyond this count, and when unused for this many days.
+UPLOAD_INDEX_MAX_ENTRIES = int(os.getenv("UPLOAD_INDEX_MAX_ENTRIES", "50"))
+UPLOAD_INDEX_MAX_AGE_DAYS = float(os.getenv("UPLOAD_INDEX_MAX_AGE_DAYS", "30"))
+# "hybrid" fuses local BM25 with vector search (vector-only when no lexical index exists); "vector" skips BM25.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+# Candidates fetched from each retriever before fusion, as a multiple of k.
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "3"))
+# "All Indexed Documents" searches each indexed document in parallel so one long tender can't take every slot.
+RETRIEVAL_FANOUT = os.getenv("RETRIEVAL_FANOUT", "1").lower() not in ("0", "false", "no")
+FANOUT_PER_DOCUMENT_K = int(os.getenv("FANOUT_PER_DOCUMENT_K", "2"))
+FANOUT_MAX_DOCUMENTS = int(os.getenv("FANOUT_MAX_DOCUMENTS", "8"))
+FANOUT_MAX_RESULTS = int(os.getenv("FANOUT_MAX_RESULTS", "8"))
+FANOUT_TIMEOUT_SECONDS = float(os.getenv("FANOUT_TIMEOUT_SECONDS", "4"))  # Per search, counted from when it starts running
+# Longest a per-document search may wait for a fan-out worker before it is dropped.
+FANOUT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("FANOUT_QUEUE_TIMEOUT_SECONDS", "30"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "6"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "5"))
+# Whole-document analysis: map calls in flight, map+combine calls started per minute (shared by all sessions), chunk cap.
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "8"))
+ANALYSIS_REQUESTS_PER_MINUTE = float(os.getenv("ANALYSIS_REQUESTS_PER_MINUTE", "120"))
+ANALYSIS_MAX_CHUNKS = int(os.getenv("ANALYSIS_MAX_CHUNKS", "400"))
+# Notes are reduced in groups of at most this many tokens until one group is left for the final answer.
+ANALYSIS_REDUCE_GROUP_TOKENS = int(os.getenv("ANALYSIS_REDUCE_GROUP_TOKENS", "6000"))
+MAP_RESULT_CACHE_PATH = os.getenv("MAP_RESULT_CACHE_PATH", os.path.join(RAG_CACHE_DIR, "map_results.sqlite"))
+UPLOAD_EMBED_BATCH_SIZE = int(os.getenv("UPLOAD_EMBED_BATCH_SIZE", "64"))
+UPLOAD_EMBED_MAX_WORKERS = int(os.getenv("UPLOAD_EMBED_MAX_WORKERS", "4"))
+
+# --- Embedding Client ---
+def get_embeddings_client():
+    """Returns the shared Azure OpenAI embeddings client, creating it on first use (no network call)."""
+    global _embeddings_client, EMBEDDING_DIMENSIONS
+    if _embeddings_client is not None or "embeddings" in _client_init_errors:
+        return _embeddings_client
+    with _embeddings_lock:
+        if _embeddings_client is None and "embeddings" not in _client_init_errors:
+            try:
+                if not all([AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_EMBEDDING_DEPLOYMENT]):
+                    raise ValueError("One or more Azure OpenAI Embedding environment variables are missing.")
+                print(f"Attempting to use Azure OpenAI Embeddings: {AZURE_OPENAI_EMBEDDING_DEPLOYMENT}")
+                _embeddings_client = CachedEmbeddings(AzureOpenAIEmbeddings(
+                    azure_deployment=AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+                    openai_api_version=AZURE_OPENAI_API_VERSION,
+                    azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                    api_key=AZURE_OPENAI_API_KEY
+                ), deployment_name=AZURE_OPENAI_EMBEDDING_DEPLOYMENT)
+                EMBEDDING_DIMENSIONS = 1536
+                print("✅ Successfully initialized Azure OpenAI Embeddings.")
+            except Exception as e:
+                print(f"❌ CRITICAL ERROR initializing Azure OpenAI Embeddings: {e}")
+                _client_init_errors["embeddings"] = str(e)
+                _embeddings_client = None
+    return _embeddings_client
+
+# --- LLM Client ---
+def get_llm():
+    """Returns the shared Azure OpenAI chat client, creating it on first use (no network call)."""
+    global _llm
+    if _llm is not None or "llm" in _client_init_errors:
+        return _llm
+    with _llm_lock:
+        if _llm is None and "llm" not in _client_init_errors:
+            try:
+                if not all([AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_CHAT_DEPLOYMENT]):
+                    raise ValueError("One or more Azure OpenAI Chat environment variables are missing.")
+                print(f"Attempting to use Azure OpenAI Chat Model: {AZURE_OPENAI_CHAT_DEPLOYMENT}")
+                _llm = AzureChatOpenAI(
+                    azure_deployment=AZURE_OPENAI_CHAT_DEPLOYMENT,
+                    openai_api_version=AZURE_OPENAI_API_VERSION,
+                    azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                    api_key=AZURE_OPENAI_API_KEY,
+                    temperature=0.1
+                )
+                print("✅ Successfully initialized Azure OpenAI Chat Model.")
+            except Exception as e:
+                print(f"❌ CRITICAL ERROR initializing Azure OpenAI Chat Model: {e}")
+                _client_init_errors["llm"] = str(e)
+                _llm = None
+    return _llm
+
+# --- Vector Store Client (Azure AI Search) ---
+VECTOR_STORE_CONFIG_ERROR = "Missing Azure AI Search configuration or embedding client."
+
+def get_vector_store():
+    """Returns the shared AzureSearch store. Building it contacts the search service, so the
+    first call blocks; start_backend_warmup() normally does this in the background."""
+    global _vector_store_for_manual_rag
+    if _vector_store_for_manual_rag is not None or "vector_store" in _client_init_errors:
+        return _vector_store_for_manual_rag
+    with _vector_store_lock:
+        if _vector_store_for_manual_rag is None and "vector_store" not in _client_init_errors:
+            try:
+                embeddings = get_embeddings_client()
+                if all([AZURE_AI_SEARCH_ENDPOINT, AZURE_AI_SEARCH_KEY, AZURE_AI_SEARCH_INDEX_NAME, embeddings]):
+                    print(f"Initializing Azure AI Search vector store for index: {AZURE_AI_SEARCH_INDEX_NAME}")
+                    _vector_store_for_manual_rag = AzureSearch(
+                        azure_search_endpoint=AZURE_AI_SEARCH_ENDPOINT,
+                        azure_search_key=AZURE_AI_SEARCH_KEY,
+                        index_name=AZURE_AI_SEARCH_INDEX_NAME,
+                        embedding_function=embeddings.embed_query,
+                        vector_field_name="content_vector"
+                    )
+                    print("✅ Global vector store initialized successfully.")
+                else:
+                    print("⚠️ Could not initialize global vector store due to missing configuration or failed embedding client init.")
+                    _client_init_errors["vector_store"] = VECTOR_STORE_CONFIG_ERROR
+            except Exception as e:
+                print(f"❌ Error initializing global vector store: {e}")
+                _client_init_errors["vector_store"] = str(e)
+                _vector_store_for_manual_rag = None
+    return _vector_store_for_manual_rag
+
+def use_backend_clients(embeddings=None, llm=None, vector_store=None):
+    """Installs pre-built clients (e.g. the local stand-ins in benchmark_rag.py) in place of the Azure ones."""
+    global _embeddings_client, _llm, _vector_store_for_manual_rag, EMBEDDING_DIMENSIONS
+    if embeddings is not None:
+        _embeddings_client = embeddings if isinstance(embeddings, CachedEmbeddings) else CachedEmbeddings(embeddings, deployment_name=type(embeddings).__name__)
+        EMBEDDING_DIMENSIONS = len(_embeddings_client.inner.embed_query("dimension probe"))
+        _client_init_errors.pop("embeddings", None)
+    if llm is not None:
+        _llm = llm
+        _client_init_errors.pop("llm", None)
+    if vector_store is not None:
+        _vector_store_for_manual_rag = vector_store
+        _client_init_errors.pop("vector_store", None)
+
+def __getattr__(name):
+    # Backwards compatibility for callers that read the old module-level client globals.
+    if name == "embeddings_client":
+        return get_embeddings_client()
+    if name == "llm":
+        return get_llm()
+    if name == "vector_store_for_manual_rag":
+        return get_vector_store()
+    if name == "rfp_files_to_process":
+        return get_indexed_files()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# --- Background Warm-up & Health Probes ---
+_health_lock = threading.Lock()
+_backend_health = {"status": "pending", "checked_at": None, "components": {}}
+_warmup_thread = None
+_startup_report = {"probes": {}, "warmup_wall_s": None}
+
+def _probe_embeddings():
+    client = get_embeddings_client()
+    if client is None:
+        raise RuntimeError(_client_init_errors.get("embeddings", "Embedding client not initialized."))
+    client.inner.embed_query("test")  # Bypass the cache so the probe really reaches the service.
+
+def _probe_llm():
+    client = get_llm()
+    if client is None:
+        raise RuntimeError(_client_init_errors.get("llm", "LLM client not initialized."))
+    client.bind(max_tokens=1).invoke("ping")  # One output token: proves the deployment answers without paying for a reply.
+
+def _probe_vector_store():
+    # Building the store contacts the service, so a failure may be transient: each probe retries it.
+    # Missing configuration stays sticky, like the embedding and LLM errors.
+    with _vector_store_lock:
+        if _vector_store_for_manual_rag is None and _client_init_errors.get("vector_store") != VECTOR_STORE_CONFIG_ERROR:
+            _client_init_errors.pop("vector_store", None)
+    if get_vector_store() is None:
+        raise RuntimeError(_client_init_errors.get("vector_store", "Vector store not initialized."))
+
+_HEALTH_PROBES = {"embeddings": _probe_embeddings, "llm": _probe_llm, "vector_store": _probe_vector_store}
+
+def _timed_probe(probe):
+    started = time.perf_counter()
+    try:
+        probe()
+        return {"ok": True, "latency_s": round(time.perf_counter() - started, 3), "error": None}
+    except Exception as e:
+        return {"ok": False, "latency_s": round(time.perf_counter() - started, 3), "error": str(e)}
+
+def _run_warmup():
+    global _warmup_thread
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(_HEALTH_PROBES), thread_name_prefix="rag-warmup") as executor:
+        futures = {name: executor.submit(_timed_probe, probe) for name, probe in _HEALTH_PROBES.items()}
+        components = {name: future.result() for name, future in futures.items()}
+    healthy_count = sum(1 for c in components.values() if c["ok"])
+    if healthy_count == len(components): status = "healthy"
+    elif healthy_count: status = "degraded"
+    else: status = "unavailable"
+    with _health_lock:
+        _backend_health.update({"status": status, "checked_at": time.time(), "components": components})
+        _startup_report["probes"] = {name: c["latency_s"] for name, c in components.items()}
+        _startup_report["warmup_wall_s"] = round(time.perf_counter() - started, 3)
+        _warmup_thread = None
+    for name, c in components.items():
+        print(f"{'✅' if c['ok'] else '❌'} Health probe '{name}' finished in {c['latency_s']}s" + (f": {c['error']}" if c["error"] else ""))
+    print(f"--- RAG Core Turbo Backend Warm-up Complete ({status}, {_startup_report['warmup_wall_s']}s) ---")
+
+def start_backend_warmup(force: bool = False):
+    """Runs the embedding, LLM and search probes concurrently on a background thread.
+    Returns immediately. Probes run once per process; later calls are no-ops unless force is set (an on-demand recheck)."""
+    global _warmup_thread
+    with _health_lock:
+        if _warmup_thread is not None:
+            return _warmup_thread
+        if not force and _backend_health["checked_at"] is not None:
+            return None
+        _warmup_thread = threading.Thread(target=_run_warmup, name="rag-backend-warmup", daemon=True)
+        _warmup_thread.start()
+        return _warmup_thread
+
+def get_backend_health() -> dict:
+    """Non-blocking snapshot of the last health result; never probes (see start_backend_warmup)."""
+    with _health_lock:
+        snapshot = {"status": _backend_health["status"], "checked_at": _backend_health["checked_at"],
+                    "components": dict(_backend_health["components"]), "checking": _warmup_thread is not None}
+    return snapshot
+
+def wait_for_backend_warmup(timeout: float = None) -> dict:
+    warmup = start_backend_warmup()
+    if warmup is not None:
+        warmup.join(timeout)
+    return get_backend_health()
+
+def get_startup_report() -> dict:
+    """Breakdown of module import time (by dependency group) and health probe latencies, in seconds."""
+    import_breakdown, previous = {}, _IMPORT_STARTED_AT
+    for stage, timestamp in _IMPORT_CHECKPOINTS.items():
+        import_breakdown[stage] = round(timestamp - previous, 3)
+        previous = timestamp
+    import_breakdown["module_body"] = round(_IMPORT_FINISHED_AT - previous, 3)
+    with _health_lock:
+        return {"import_s": round(_IMPORT_FINISHED_AT - _IMPORT_STARTED_AT, 3), "import_breakdown_s": import_breakdown,
+                "probes_s": dict(_startup_report["probes"]), "warmup_wall_s": _startup_report["warmup_wall_s"],
+                "health_status": _backend_health["status"]}
+
+# --- Answer Cache & Index Versioning ---
+answer_cache = AnswerCache()
+_index_version_cache = {"mtime": None, "version": None}
+
+def get_index_version() -> str:
+    """Version of the indexed corpus, shared by all workers through INDEX_VERSION_PATH."""
+    try:
+        mtime = os.path.getmtime(INDEX_VERSION_PATH)
+    except OSError:
+        return os.getenv("RFP_INDEX_VERSION", "0")
+    if _index_version_cache["mtime"] != mtime:
+        with open(INDEX_VERSION_PATH, "r", encoding="utf-8") as f:
+            _index_version_cache.update({"mtime": mtime, "version": f.read().strip()})
+    return _index_version_cache["version"]
+
+def bump_index_version() -> str:
+    """Marks the index as changed (call after re-indexing); cached answers for the old version stop matching."""
+    os.makedirs(RAG_CACHE_DIR, exist_ok=True)
+    version = f"{int(time.time() * 1000)}-{os.urandom(4).hex()}"
+    tmp_path = f"{INDEX_VERSION_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, INDEX_VERSION_PATH)
+    answer_cache.clear()
+    return version
+
+# --- Indexed Document Manifest (published by index_pipeline.py) ---
+_manifest_cache = {"mtime": None, "manifest": {"documents": {}}}
+
+def load_index_manifest() -> dict:
+    """The manifest written by index_pipeline.py, re-read only when the file changes."""
+    try:
+        mtime = os.path.getmtime(INDEX_MANIFEST_PATH)
+    except OSError:
+        return {"documents": {}}
+    if _manifest_cache["mtime"] != mtime:
+        try:
+            with open(INDEX_MANIFEST_PATH, "r", encoding="utf-8") as f:
+                _manifest_cache.update({"mtime": mtime, "manifest": json.load(f)})
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read index manifest '{INDEX_MANIFEST_PATH}': {e}")
+            return {"documents": {}}
+    return json.loads(json.dumps(_manifest_cache["manifest"]))
+
+# source_document facet of the search index, re-queried at most every INDEXED_FILES_TTL_SECONDS.
+INDEXED_FILES_TTL_SECONDS = float(os.getenv("INDEXED_FILES_TTL_SECONDS", "300"))
+_indexed_files_cache = {"checked_at": 0.0, "files": None}
+_indexed_files_lock = threading.Lock()
+
+def _indexed_files_from_search_index():
+    """Document names from a source_document facet query; None until the vector store exists or if the query fails."""
+    vector_store = _vector_store_for_manual_rag  # Never builds the store here: this runs on every page render.
+    client = getattr(vector_store, "client", None)
+    if client is None:
+        return None
+    with _indexed_files_lock:
+        if _indexed_files_cache["files"] is not None and time.time() - _indexed_files_cache["checked_at"] < INDEXED_FILES_TTL_SECONDS:
+            return _indexed_files_cache["files"]
+        try:
+            facets = client.search(search_text="*", facets=["source_document,count:1000"], top=0).get_facets() or {}
+            files = sorted(facet["value"] for facet in facets.get("source_document", []) if facet.get("value"))
+        except Exception as e:
+            print(f"⚠️ Could not list documents from the search index: {e}")
+            files = _indexed_files_cache["files"]
+        _indexed_files_cache.update({"checked_at": time.time(), "files": files})
+        return files
+
+def get_indexed_files() -> list:
+    """Names of the documents in the search index: from the index itself once it is connected, else
+    from the local manifest, else the expected Blob files."""
+    files = _indexed_files_from_search_index()
+    if files:
+        return files
+    documents = load_index_manifest().get("documents", {})
+    return sorted(documents) if documents else list(rfp_files_expected_in_blob)
+
+# --- Lexical (BM25) Index for the Azure corpus (built by index_pipeline.py) ---
+_lexical_index_cache = {"mtime": None, "index": None}
+_lexical_index_lock = threading.Lock()
+
+def get_lexical_index():
+    """BM25 index over every chunk in the search index, reloaded when the pipeline rewrites it; None if absent."""
+    try:
+        mtime = os.path.getmtime(LEXICAL_INDEX_PATH)
+    except OSError:
+        return None
+    with _lexical_index_lock:
+        if _lexical_index_cache["mtime"] != mtime:
+            try:
+                _lexical_index_cache.update({"mtime": mtime, "index": BM25Index.load(LEXICAL_INDEX_PATH)})
+            except Exception as e:
+                print(f"⚠️ Could not load lexical index '{LEXICAL_INDEX_PATH}': {e}")
+                return None
+        return _lexical_index_cache["index"]
+
+def _prompt_version(prompt_template_obj: PromptTemplate) -> str:
+    return hashlib.sha256(prompt_template_obj.template.encode("utf-8")).hexdigest()[:16]
+
+def _answer_cache_scope(vector_store_obj, prompt_template_obj: PromptTemplate, target_document_name: str = None, k: int = None, retrieval_mode: str = None):
+    """Cache scope for a query, or None when the store has no stable content identity."""
+    if _is_search_index(vector_store_obj):
+        corpus = f"azure:{AZURE_AI_SEARCH_INDEX_NAME}:{get_index_version()}"
+    elif getattr(vector_store_obj, "content_hash", None):
+        corpus = f"upload:{vector_store_obj.content_hash}"
     else:
-        print("⚠️ Could not initialize global vector store due to missing configuration or failed embedding client init.")
-except Exception as e:
-    print(f"❌ Error initializing global vector store: {e}")
-    vector_store_for_manual_rag = None
+        return None
+    document_filter = target_document_name if target_document_name and target_document_name != "All Indexed Documents" else "*"
+    fanout = (FANOUT_PER_DOCUMENT_K, FANOUT_MAX_DOCUMENTS, FANOUT_MAX_RESULTS) if document_filter == "*" and _fanout_documents(vector_store_obj) else None
+    return AnswerCache.make_scope(corpus, document_filter, _prompt_version(prompt_template_obj), k or RETRIEVAL_K, retrieval_mode or RETRIEVAL_MODE, CONTEXT_TOKEN_BUDGET, fanout)
+
+def get_cache_stats() -> dict:
+    """Hit/miss counters for the backend caches (safe to call before any client exists)."""
+    return {"embeddings": _embeddings_client.stats() if _embeddings_client is not None else None,
+            "answers": answer_cache.stats(), "map_results": map_result_cache.stats()}
 
 # --- DEFINITIVE PROMPT TEMPLATE (Fixes "Bunched Text") ---
 RFP_PROMPT_TEMPLATE = """
@@ -135,49 +456,809 @@ Based on the provided documents, here are the critical details:
 """
 RFP_PROMPT = PromptTemplate(template=RFP_PROMPT_TEMPLATE, input_variables=["context", "question"])
 
+# --- RAG Building Blocks (shared by the blocking and streaming entry points) ---
+NO_RESULTS_ANSWER = "No relevant information found in the selected documents for your query."
+
+def _lookup_cached_answer(user_query: str, cache_scope: str):
+    """Returns (cached_entry_or_None, query_vector_or_None)."""
+    if not cache_scope:
+        return None, None
+    with span("answer_cache_lookup") as lookup:
+        cached = answer_cache.get(user_query, cache_scope)
+        query_vector = None
+        if cached is None and answer_cache.similarity_threshold > 0:
+            # The embedding cache makes this the same vector the similarity search below uses.
+            query_vector = get_embeddings_client().embed_query(user_query)
+            cached = answer_cache.get(user_query, cache_scope, query_vector=query_vector)
+        lookup.set(hit=cached is not None)
+    return cached, query_vector
+
+_retrieval_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVAL_MAX_WORKERS", "16")), thread_name_prefix="rag-retrieval")
+# Per-document searches get their own pool, sized so a full checklist batch fans out without queueing.
+_fanout_executor = ThreadPoolExecutor(max_workers=int(os.getenv("FANOUT_MAX_WORKERS", str(FANOUT_MAX_DOCUMENTS * BATCH_MAX_CONCURRENCY))), thread_name_prefix="rag-fanout")
+
+def _is_search_index(vector_store_obj) -> bool:
+    """True for the shared index (AzureSearch, or a stand-in declaring supports_odata_filters), False for upload stores."""
+    return isinstance(vector_store_obj, AzureSearch) or getattr(vector_store_obj, "supports_odata_filters", False)
+
+_hybrid_unavailable_warned = False
+
+def _lexical_index_for(vector_store_obj):
+    global _hybrid_unavailable_warned
+    lexical_index = getattr(vector_store_obj, "lexical_index", None)
+    if lexical_index is None and isinstance(vector_store_obj, AzureSearch):
+        lexical_index = get_lexical_index()
+        if lexical_index is None and not _hybrid_unavailable_warned:
+            _hybrid_unavailable_warned = True
+            print(f"⚠️ Hybrid retrieval unavailable: no lexical index at '{LEXICAL_INDEX_PATH}' on this host "
+                  "(it is written by index_pipeline.py); the search index is queried vector-only.")
+    return lexical_index
+
+def _traced_vector_search(parent, vector_store_obj, **search_kwargs):
+    # Runs on a retrieval worker thread, so the parent span is passed in explicitly.
+    with span("vector_search", parent=parent) as search:
+        docs = vector_store_obj.similarity_search(**search_kwargs)
+        search.set(results=len(docs))
+        return docs
+
+def _source_filter(source_document: str) -> str:
+    # OData string literals escape a single quote by doubling it.
+    return "source_document eq '{}'".format(source_document.replace("'", "''"))
+
+def _fanout_documents(vector_store_obj) -> list:
+    """Documents an unfiltered search of the shared index fans out over (empty when fan-out doesn't apply)."""
+    if not RETRIEVAL_FANOUT or not _is_search_index(vector_store_obj):
+        return []
+    documents = [os.path.basename(name) for name in get_indexed_files()]
+    return documents[:FANOUT_MAX_DOCUMENTS] if len(documents) > 1 else []
+
+def _fanout_vector_search(user_query: str, vector_store_obj, documents: list, per_document_k: int, max_results: int) -> list:
+    """One filtered search per document in parallel, merged by relevance score.
+
+    A search still running FANOUT_TIMEOUT_SECONDS after it started is left out of the result, so a
+    slow document costs coverage, not latency; time spent queued for a worker doesn't count (up to
+    FANOUT_QUEUE_TIMEOUT_SECONDS). Every dropped document is logged. A rate-limited
+    search fails the whole call with its 429, so call_with_backoff retries every document rather
+    than the answer silently losing that one.
+    """
+    with span("fanout_search", documents=len(documents), per_document_k=per_document_k) as fanout:
+        get_embeddings_client().embed_query(user_query)  # One embedding call; the per-document searches hit the cache.
+        started_at = {document: None for document in documents}
+        started = {document: threading.Event() for document in documents}
+
+        def search(document):
+            started_at[document] = time.monotonic()
+            started[document].set()
+            return _traced_scored_search(fanout, vector_store_obj, user_query, per_document_k, _source_filter(document))
+
+        futures = {_fanout_executor.submit(search, document): document for document in documents}
+        scored, timed_out, failed, errors = [], [], [], []
+        for future, document in futures.items():
+            try:
+                if not started[document].wait(FANOUT_QUEUE_TIMEOUT_SECONDS):
+                    raise FuturesTimeoutError()
+                scored.extend(future.result(timeout=max(0.0, started_at[document] + FANOUT_TIMEOUT_SECONDS - time.monotonic())))
+            except FuturesTimeoutError:
+                future.cancel()
+                print(f"⚠️ Fan-out search for '{document}' {'timed out' if started[document].is_set() else 'never got a worker'}; it is left out of this answer.")
+                timed_out.append(document)
+            except Exception as e:
+                print(f"⚠️ Fan-out search failed for '{document}': {e}")
+                failed.append(document)
+                errors.append(e)
+        rate_limited = next((e for e in errors if _is_rate_limit_error(e)), None)
+        if rate_limited is not None or (errors and len(failed) == len(documents)):
+            for future in futures:
+                future.cancel()
+            fanout.set(timed_out=timed_out, failed=failed)
+            raise rate_limited or errors[0]
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        fanout.set(results=min(len(scored), max_results), timed_out=timed_out, failed=failed)
+        return [doc for doc, _ in scored[:max_results]]
+
+def _traced_scored_search(parent, vector_store_obj, user_query: str, k: int, search_filters: str) -> list:
+    with span("vector_search", parent=parent, filter=search_filters) as search:
+        pairs = vector_store_obj.similarity_search_with_relevance_scores(user_query, k=k, filters=search_filters)
+        search.set(results=len(pairs))
+        return pairs
+
+def _retrieve_documents(user_query: str, vector_store_obj, target_document_name: str = None, k: int = None, retrieval_mode: str = None):
+    k = k or RETRIEVAL_K
+    fanout_documents = [] if target_document_name and target_document_name != "All Indexed Documents" else _fanout_documents(vector_store_obj)
+    if fanout_documents:
+        retrieved_docs = _retrieve_fanout(user_query, vector_store_obj, fanout_documents, retrieval_mode)
+        if retrieved_docs:
+            return retrieved_docs
+        # Every search timed out, or the manifest names documents the index doesn't have.
+        print(f"⚠️ Fan-out over {len(fanout_documents)} documents returned nothing; falling back to one unfiltered search.")
+    lexical_index = _lexical_index_for(vector_store_obj) if (retrieval_mode or RETRIEVAL_MODE) == "hybrid" else None
+    candidates = k * HYBRID_CANDIDATE_MULTIPLIER if lexical_index is not None else k
+    with span("retrieval", mode="hybrid" if lexical_index is not None else "vector", k=k) as retrieval:
+        # Check the TYPE of the vector store to decide how to query it.
+        search_kwargs, source_document = {"query": user_query, "k": candidates}, None
+        if _is_search_index(vector_store_obj):
+            retrieval.set(store="search_index")
+            if target_document_name and target_document_name != "All Indexed Documents": 
+                search_kwargs["filters"] = _source_filter(target_document_name)
+                source_document = target_document_name
+                retrieval.set(filter=search_kwargs["filters"])
+        else: # Assumes it's a temporary in-memory store from an upload
+            retrieval.set(store="upload")
+        vector_future = _retrieval_executor.submit(_traced_vector_search, retrieval, vector_store_obj, **search_kwargs)
+        if lexical_index is None:
+            retrieved_docs = vector_future.result()
+        else:
+            # BM25 runs locally while the vector search is in flight.
+            with span("keyword_search") as keyword:
+                lexical_docs = [doc for doc, _ in lexical_index.search(user_query, candidates, source_document=source_document)]
+                keyword.set(results=len(lexical_docs))
+            retrieved_docs = reciprocal_rank_fusion([vector_future.result(), lexical_docs], k)
+        retrieval.set(results=len(retrieved_docs))
+    return retrieved_docs
+
+def _retrieve_fanout(user_query: str, vector_store_obj, documents: list, retrieval_mode: str = None):
+    """Per-document quota of FANOUT_PER_DOCUMENT_K chunks, capped at FANOUT_MAX_RESULTS overall."""
+    lexical_index = _lexical_index_for(vector_store_obj) if (retrieval_mode or RETRIEVAL_MODE) == "hybrid" else None
+    max_results = max(FANOUT_MAX_RESULTS, 1)
+    with span("retrieval", mode="hybrid_fanout" if lexical_index is not None else "vector_fanout", k=max_results, store="search_index") as retrieval:
+        if lexical_index is None:
+            retrieved_docs = _fanout_vector_search(user_query, vector_store_obj, documents, FANOUT_PER_DOCUMENT_K, max_results)
+        else:
+            per_document_candidates = FANOUT_PER_DOCUMENT_K * HYBRID_CANDIDATE_MULTIPLIER
+            # BM25 is local and takes milliseconds; the vector fan-out runs on this thread so it never
+            # waits on the retrieval pool from inside it.
+            with span("keyword_search") as keyword:
+                lexical_ranked = [lexical_index.search(user_query, per_document_candidates, source_document=document) for document in documents]
+                keyword.set(results=sum(len(ranked) for ranked in lexical_ranked))
+            vector_docs = _fanout_vector_search(user_query, vector_store_obj, documents, per_document_candidates, per_document_candidates * len(documents))
+            # Fuse within each document so the quota holds, then interleave by fused score.
+            fused = []
+            for document, lexical_pairs in zip(documents, lexical_ranked):
+                vector_ranked = [doc for doc in vector_docs if doc.metadata.get("source_document") == document]
+                fused.extend(reciprocal_rank_fusion([vector_ranked, [doc for doc, _ in lexical_pairs]], FANOUT_PER_DOCUMENT_K, with_scores=True))
+            fused.sort(key=lambda pair: pair[1], reverse=True)
+            retrieved_docs = [doc for doc, _ in fused[:max_results]]
+        retrieval.set(results=len(retrieved_docs), documents=len({doc.metadata.get("source_document") for doc in retrieved_docs}))
+    return retrieved_docs
+
+def _format_rag_prompt(user_query: str, retrieved_docs, prompt_template_obj: PromptTemplate):
+    """Returns (prompt, docs actually in the context) after overlap merging and token budgeting."""
+    with span("context_assembly") as assembly:
+        combined_context, used_docs, report = pack_context(retrieved_docs)
+        assembly.set(**report)
+        CONTEXT_TOKENS.observe(report["packed_tokens"])
+        return prompt_template_obj.format(context=combined_context, question=user_query), used_docs
+
+def _sources_for_ui(retrieved_docs) -> list:
+    return [{"source_document": doc.metadata.get('source_document', 'Uploaded Document'), "content_snippet": doc.page_content} for doc in retrieved_docs]
+
+def _message_text(message_obj) -> str:
+    return message_obj.content if hasattr(message_obj, 'content') else str(message_obj)
+
+def _record_generation_usage(generation_span, prompt_text: str, answer_text: str, message_obj=None):
+    """Token counters from the response's usage metadata when present, else tiktoken estimates."""
+    usage = getattr(message_obj, "usage_metadata", None) or {}
+    token_usage = (getattr(message_obj, "response_metadata", None) or {}).get("token_usage") or {}
+    prompt_tokens = usage.get("input_tokens") or token_usage.get("prompt_tokens") or count_tokens(prompt_text)
+    completion_tokens = usage.get("output_tokens") or token_usage.get("completion_tokens") or count_tokens(answer_text)
+    record_llm_tokens(prompt_tokens, completion_tokens, deployment=AZURE_OPENAI_CHAT_DEPLOYMENT or "")
+    generation_span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
 # --- THE COMPLETE, FIXED RAG FUNCTION ---
-def perform_manual_rag_query(user_query: str, vector_store_obj, llm_client_obj, prompt_template_obj: PromptTemplate, target_document_name: str = None):
-    if not all([vector_store_obj, embeddings_client, llm_client_obj]):
+def perform_manual_rag_query(user_query: str, vector_store_obj, llm_client_obj, prompt_template_obj: PromptTemplate, target_document_name: str = None, k: int = None, retrieval_mode: str = None):
+    if not all([vector_store_obj, get_embeddings_client(), llm_client_obj]):
         error_msg = "Error: A required backend component (vector store, embeddings, or LLM) is not initialized."
         print(f"BACKEND ERROR: {error_msg}")
+        QUERIES.inc(entry="blocking", outcome="not_initialized")
         return {"answer": error_msg, "sources_for_ui": []}
 
+    with span("rag_query", entry="blocking", document=target_document_name or "") as query_span:
+        try:
+            cache_scope = _answer_cache_scope(vector_store_obj, prompt_template_obj, target_document_name, k, retrieval_mode)
+            cached, query_vector = _lookup_cached_answer(user_query, cache_scope)
+            if cached is not None:
+                QUERIES.inc(entry="blocking", outcome="cache_hit")
+                return {"answer": cached["answer"], "sources_for_ui": cached["sources_for_ui"], "cache_hit": True}
+
+            retrieved_docs = _retrieve_documents(user_query, vector_store_obj, target_document_name, k, retrieval_mode)
+            if not retrieved_docs:
+                QUERIES.inc(entry="blocking", outcome="no_results")
+                return {"answer": NO_RESULTS_ANSWER, "sources_for_ui": []}
+
+            formatted_prompt_str, retrieved_docs = _format_rag_prompt(user_query, retrieved_docs, prompt_template_obj)
+
+            with span("generation") as generation:
+                response_message_obj = llm_client_obj.invoke(formatted_prompt_str)
+                answer = _message_text(response_message_obj)
+                _record_generation_usage(generation, formatted_prompt_str, answer, response_message_obj)
+
+            source_info_for_display = _sources_for_ui(retrieved_docs)
+            if cache_scope:
+                answer_cache.set(user_query, cache_scope, answer, source_info_for_display, query_vector=query_vector)
+            QUERIES.inc(entry="blocking", outcome="ok")
+            return {"answer": answer, "sources_for_ui": source_info_for_display}
+
+        except Exception as e:
+            print(f"Error in perform_manual_rag_query: {e}")
+            traceback.print_exc()
+            query_span.error = f"{type(e).__name__}: {e}"
+            QUERIES.inc(entry="blocking", outcome="error")
+            return {"answer": f"An error occurred in the backend while processing your RAG query: {str(e)}", "sources_for_ui": []}
+
+# --- STREAMING VARIANT ---
+def stream_manual_rag_query(user_query: str, vector_store_obj, llm_client_obj, prompt_template_obj: PromptTemplate, target_document_name: str = None, k: int = None, retrieval_mode: str = None):
+    """Generator version of perform_manual_rag_query.
+
+    Yields event dicts in this order: one {"type": "sources", "sources_for_ui": [...]} as soon as
+    retrieval finishes, then {"type": "token", "content": str} per model chunk, then a final
+    {"type": "done", "answer": str}. Errors are reported as a token so the chat shows them.
+    """
+    if not all([vector_store_obj, get_embeddings_client(), llm_client_obj]):
+        error_msg = "Error: A required backend component (vector store, embeddings, or LLM) is not initialized."
+        print(f"BACKEND ERROR: {error_msg}")
+        QUERIES.inc(entry="stream", outcome="not_initialized")
+        yield {"type": "sources", "sources_for_ui": []}
+        yield {"type": "token", "content": error_msg}
+        yield {"type": "done", "answer": error_msg}
+        return
+
+    sources_sent, answer_parts = False, []
+    with span("rag_query", entry="stream", document=target_document_name or "") as query_span:
+        try:
+            cache_scope = _answer_cache_scope(vector_store_obj, prompt_template_obj, target_document_name, k, retrieval_mode)
+            cached, query_vector = _lookup_cached_answer(user_query, cache_scope)
+            if cached is not None:
+                QUERIES.inc(entry="stream", outcome="cache_hit")
+                yield {"type": "sources", "sources_for_ui": cached["sources_for_ui"], "cache_hit": True}
+                yield {"type": "token", "content": cached["answer"]}
+                yield {"type": "done", "answer": cached["answer"], "cache_hit": True}
+                return
+
+            retrieved_docs = _retrieve_documents(user_query, vector_store_obj, target_document_name, k, retrieval_mode)
+            if retrieved_docs:
+                formatted_prompt_str, retrieved_docs = _format_rag_prompt(user_query, retrieved_docs, prompt_template_obj)
+            source_info_for_display = _sources_for_ui(retrieved_docs)
+            sources_sent = True
+            yield {"type": "sources", "sources_for_ui": source_info_for_display}
+            if not retrieved_docs:
+                QUERIES.inc(entry="stream", outcome="no_results")
+                yield {"type": "token", "content": NO_RESULTS_ANSWER}
+                yield {"type": "done", "answer": NO_RESULTS_ANSWER}
+                return
+
+            with span("generation", parent=query_span) as generation:
+                for chunk in llm_client_obj.stream(formatted_prompt_str):
+                    token = _message_text(chunk)
+                    if token:
+                        if not answer_parts:
+                            time_to_first_token = time.perf_counter() - query_span.started_at
+                            generation.set(time_to_first_token_s=round(time_to_first_token, 3))
+                            TIME_TO_FIRST_TOKEN.observe(time_to_first_token)
+                        answer_parts.append(token)
+                        yield {"type": "token", "content": token}
+                answer = "".join(answer_parts)
+                _record_generation_usage(generation, formatted_prompt_str, answer)
+
+            if cache_scope:
+                answer_cache.set(user_query, cache_scope, answer, source_info_for_display, query_vector=query_vector)
+            QUERIES.inc(entry="stream", outcome="ok")
+            yield {"type": "done", "answer": answer}
+
+        except Exception as e:
+            print(f"Error in stream_manual_rag_query: {e}")
+            traceback.print_exc()
+            query_span.error = f"{type(e).__name__}: {e}"
+            QUERIES.inc(entry="stream", outcome="error")
+            error_msg = f"An error occurred in the backend while processing your RAG query: {str(e)}"
+            if not sources_sent:
+                yield {"type": "sources", "sources_for_ui": []}
+            answer = "".join(answer_parts) + ("\n\n" if answer_parts else "") + error_msg
+            yield {"type": "token", "content": ("\n\n" if answer_parts else "") + error_msg}
+            yield {"type": "done", "answer": answer}
+
+# --- BATCH CHECKLIST QUERIES ---
+DEFAULT_CHECKLIST_QUESTIONS = [
+    "What is the closing date and time for submissions?",
+    "Is there a compulsory briefing session, and when is it?",
+    "List all mandatory returnable documents.",
+    "What B-BBEE and other compliance requirements apply?",
+    "What are the technical requirements of the solution or service?",
+    "What are the evaluation criteria and their weightings?",
+    "What is the contract duration?",
+    "Who is the contact person for enquiries?",
+]
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "rate limit" in str(error).lower() or "429" in str(error)
+
+def _retry_after_seconds(error: Exception):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
     try:
-        # Check the TYPE of the vector store to decide how to query it.
-        if isinstance(vector_store_obj, AzureSearch):
-            print(f"DEBUG: Querying Azure AI Search for: '{user_query}'")
-            search_filters = None
-            if target_document_name and target_document_name != "All Indexed Documents": 
-                search_filters = f"source_document eq '{target_document_name}'"
-            print(f"DEBUG: Applying filter: '{search_filters}'")
-            retrieved_docs = vector_store_obj.similarity_search(query=user_query, k=3, filters=search_filters)
-        else: # Assumes it's a temporary Chroma store from an upload
-            print(f"DEBUG: Querying temporary in-memory Chroma DB for: '{user_query}'")
-            retrieved_docs = vector_store_obj.similarity_search(query=user_query, k=3)
-        
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def call_with_backoff(fn, *args, max_retries: int = BATCH_MAX_RETRIES, base_delay: float = 1.0, **kwargs):
+    """Calls fn, retrying 429/rate-limit errors with exponential backoff and jitter (honouring Retry-After)."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_retries or not _is_rate_limit_error(e):
+                raise
+            delay = _retry_after_seconds(e) or base_delay * (2 ** attempt)
+            delay *= 1 + random.random() * 0.25
+            print(f"⚠️ Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            RATE_LIMIT_RETRIES.inc(call=getattr(fn, "__name__", "call"))
+            time.sleep(delay)
+
+def perform_batch_rag_queries(questions: list, vector_store_obj, llm_client_obj, prompt_template_obj: PromptTemplate, target_document_name: str = None, max_concurrency: int = None, k: int = None, retrieval_mode: str = None):
+    """Answers a checklist of questions concurrently, yielding each result as soon as it completes.
+
+    Yields dicts with index, question, answer, sources_for_ui, cache_hit and latency_s. At most
+    max_concurrency questions (BATCH_MAX_CONCURRENCY by default) are in flight; rate-limited
+    embedding, search and LLM calls back off and retry. All uncached question embeddings are
+    fetched in one batched call up front, and questions that normalize to the same text share one
+    retrieval and one LLM call.
+    """
+    if not all([vector_store_obj, get_embeddings_client(), llm_client_obj]):
+        error_msg = "Error: A required backend component (vector store, embeddings, or LLM) is not initialized."
+        print(f"BACKEND ERROR: {error_msg}")
+        for index, question in enumerate(questions):
+            yield {"index": index, "question": question, "answer": error_msg, "sources_for_ui": [], "cache_hit": False, "latency_s": 0.0}
+        return
+
+    embeddings = get_embeddings_client()
+    if hasattr(embeddings, "prime_queries"):
+        try:
+            call_with_backoff(embeddings.prime_queries, questions)
+        except Exception as e:
+            print(f"⚠️ Could not pre-embed checklist questions, embedding individually: {e}")
+
+    cache_scope = _answer_cache_scope(vector_store_obj, prompt_template_obj, target_document_name, k, retrieval_mode)
+    shared_lock = threading.Lock()
+    shared_answers = {}
+
+    def generate(question):
+        retrieved_docs = call_with_backoff(_retrieve_documents, question, vector_store_obj, target_document_name, k, retrieval_mode)
         if not retrieved_docs:
-            return {"answer": "No relevant information found in the selected documents for your query.", "sources_for_ui": []}
-
-        print(f"DEBUG: Retrieved {len(retrieved_docs)} documents for context.")
-        context_parts = [doc.page_content for doc in retrieved_docs]
-        combined_context = "\n\n---\n\n".join(context_parts)
-        
-        formatted_prompt_str = prompt_template_obj.format(context=combined_context, question=user_query)
-        
-        print("DEBUG: Sending formatted prompt to LLM.")
-        response_message_obj = llm_client_obj.invoke(formatted_prompt_str)
-        answer = response_message_obj.content if hasattr(response_message_obj, 'content') else str(response_message_obj)
-        print("DEBUG: LLM invocation complete.")
-        
-        source_info_for_display = [{"source_document": doc.metadata.get('source_document', 'Uploaded Document'), "content_snippet": doc.page_content} for doc in retrieved_docs]
-        return {"answer": answer, "sources_for_ui": source_info_for_display}
+            return NO_RESULTS_ANSWER, [], False
+        formatted_prompt_str, retrieved_docs = _format_rag_prompt(question, retrieved_docs, prompt_template_obj)
+        with span("generation") as generation:
+            response_message_obj = call_with_backoff(llm_client_obj.invoke, formatted_prompt_str)
+            answer = _message_text(response_message_obj)
+            _record_generation_usage(generation, formatted_prompt_str, answer, response_message_obj)
+        return answer, _sources_for_ui(retrieved_docs), True
 
-    except Exception as e:
-        print(f"Error in perform_manual_rag_query: {e}")
-        traceback.print_exc()
-        return {"answer": f"An error occurred in the backend while processing your RAG query: {str(e)}", "sources_for_ui": []}
+    def generate_shared(question):
+        key = " ".join(question.split()).casefold()
+        with shared_lock:
+            future = shared_answers.get(key)
+            owner = future is None
+            if owner:
+                future = shared_answers[key] = Future()
+        if owner:
+            try:
+                future.set_result(generate(question))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def answer_one(index, question):
+        started = time.perf_counter()
+        result = {"index": index, "question": question, "cache_hit": False}
+        with span("rag_query", entry="batch", document=target_document_name or "") as query_span:
+            try:
+                cached, query_vector = _lookup_cached_answer(question, cache_scope)
+                if cached is not None:
+                    result.update(answer=cached["answer"], sources_for_ui=cached["sources_for_ui"], cache_hit=True)
+                    QUERIES.inc(entry="batch", outcome="cache_hit")
+                    return result
+                answer, source_info_for_display, cacheable = generate_shared(question)
+                if cache_scope and cacheable:
+                    answer_cache.set(question, cache_scope, answer, source_info_for_display, query_vector=query_vector)
+                result.update(answer=answer, sources_for_ui=source_info_for_display)
+                QUERIES.inc(entry="batch", outcome="ok" if cacheable else "no_results")
+            except Exception as e:
+                print(f"Error in perform_batch_rag_queries for '{question}': {e}")
+                traceback.print_exc()
+                query_span.error = f"{type(e).__name__}: {e}"
+                QUERIES.inc(entry="batch", outcome="error")
+                result.update(answer=f"An error occurred in the backend while processing your RAG query: {str(e)}", sources_for_ui=[])
+            finally:
+                result["latency_s"] = round(time.perf_counter() - started, 3)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency or BATCH_MAX_CONCURRENCY), thread_name_prefix="rag-batch") as executor:
+        futures = [executor.submit(answer_one, index, question) for index, question in enumerate(questions)]
+        for future in as_completed(futures):
+            yield future.result()
+
+# --- WHOLE-DOCUMENT ANALYSIS (map-reduce over every chunk) ---
+# The map prompt does not include the question, so its per-chunk output is cached by chunk content
+# and prompt version and is reused by every later question about the same document.
+ANALYSIS_MAP_PROMPT = PromptTemplate(template="""
+You are an expert RFP and tender document analyst. Extract every fact from the excerpt below that a bidder would need:
+scope and deliverables, mandatory/technical/functional requirements, dates and deadlines, briefing and submission details,
+returnable documents, evaluation criteria and weightings, compliance (B-BBEE, tax, certifications), pricing and contract terms, and contacts.
+
+Write terse Markdown bullet points and quote numbers, dates and clause references exactly.
+If the excerpt has nothing of substance (a cover page, a blank form, a table of contents), reply with exactly NONE.
+
+**EXCERPT:**
+{chunk}
+
+**EXTRACTED FACTS:**
+""", input_variables=["chunk"])
+
+ANALYSIS_COMBINE_PROMPT = PromptTemplate(template="""
+Merge the notes below, taken from consecutive parts of the tender document "{document}", into one list of terse Markdown bullet points.
+Remove duplicates, keep numbers, dates and clause references exactly, and keep everything relevant to this question: {question}
+
+**NOTES:**
+{notes}
+
+**MERGED NOTES:**
+""", input_variables=["document", "notes", "question"])
+
+ANALYSIS_FINAL_PROMPT = PromptTemplate(template="""
+You are an expert RFP and tender document analyst for Think Tank Software Solutions.
+The notes below were extracted from every part of the tender document "{document}", in document order.
+Answer the question from these notes only, with clear, professionally formatted Markdown (headings and bullet points).
+
+**NOTES:**
+{notes}
+
+**QUESTION:** {question}
+
+**ANALYST'S RESPONSE:**
+""", input_variables=["document", "notes", "question"])
+
+EMPTY_MAP_RESULT = "NONE"
+map_result_cache = TextResultCache(MAP_RESULT_CACHE_PATH)
+
+class RateLimiter:
+    """Spaces call starts evenly so at most rate_per_minute begin per minute (0 disables the limit)."""
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+_analysis_rate_limiter = RateLimiter(ANALYSIS_REQUESTS_PER_MINUTE)
+
+# Chunk lists read from the search index, per (index, index version, document).
+_document_chunks_cache = TTLCache(32, float(os.getenv("DOCUMENT_CHUNKS_CACHE_TTL_SECONDS", "600")))
+
+def _search_index_chunks(vector_store_obj, document_name: str):
+    """Every chunk of a document from Azure AI Search, in chunk_index order; None if the store has no search client.
+
+    chunk_index is only stored inside the metadata JSON (not a sortable field), so results are
+    ordered here rather than by the service.
+    """
+    client = getattr(vector_store_obj, "client", None)
+    if client is None:
+        return None
+    chunks = []
+    for result in client.search(search_text="*", filter=_source_filter(document_name), select=["content", "metadata"]):
+        try:
+            metadata = json.loads(result.get("metadata") or "{}")
+        except ValueError:
+            metadata = {}
+        metadata["source_document"] = document_name
+        chunks.append(LCDocument(page_content=result.get("content") or "", metadata=metadata))
+    chunks.sort(key=lambda doc: doc.metadata.get("chunk_index", 0))
+    return chunks
+
+def get_document_chunks(vector_store_obj, document_name: str = None) -> list:
+    """Every chunk of one document (or of an upload store), in document order.
+
+    Indexed documents are read from the search index itself; the local lexical index file (only
+    present where index_pipeline.py ran) is a fallback when the index can't be read.
+    """
+    if _is_search_index(vector_store_obj) and document_name:
+        key = (AZURE_AI_SEARCH_INDEX_NAME, get_index_version(), document_name)
+        chunks = _document_chunks_cache.get(key)
+        if chunks is None:
+            try:
+                chunks = _search_index_chunks(vector_store_obj, document_name)
+            except Exception as e:
+                print(f"⚠️ Could not read the chunks of '{document_name}' from the search index, trying the local lexical index: {e}")
+            if chunks:
+                _document_chunks_cache.set(key, chunks)
+        if chunks:
+            return list(chunks)
+    lexical_index = _lexical_index_for(vector_store_obj)
+    if lexical_index is None:
+        return []
+    return lexical_index.documents_for_source(document_name) if document_name else list(lexical_index.documents)
+
+def _limited_llm_call(llm_client_obj, prompt: str, parent, stage: str) -> str:
+    with span(stage, parent=parent) as call:
+        _analysis_rate_limiter.acquire()
+        response_message_obj = call_with_backoff(llm_client_obj.invoke, prompt)
+        text = _message_text(response_message_obj).strip()
+        _record_generation_usage(call, prompt, text, response_message_obj)
+        return text
+
+def _group_notes(notes: list, max_tokens: int) -> list:
+    groups, current, current_tokens = [], [], 0
+    for note in notes:
+        tokens = count_tokens(note)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(note)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def stream_document_analysis(user_query: str, vector_store_obj, llm_client_obj, target_document_name: str = None, max_concurrency: int = None):
+    """Answers a question from a whole document: maps an extraction prompt over every chunk, reduces the notes hierarchically, streams the answer.
+
+    Yields {"type": "progress", "stage", "done", "total", "cached", "message"} while mapping and
+    reducing, then {"type": "sources", "sources_for_ui"}, {"type": "token", "content"} events and a
+    final {"type": "done", "answer"}. Map calls run concurrently (max_concurrency) under the shared
+    ANALYSIS_REQUESTS_PER_MINUTE limit, and each chunk's notes are cached by content hash and map
+    prompt version.
+    """
+    if not all([vector_store_obj, llm_client_obj]):
+        error_msg = "Error: A required backend component (vector store or LLM) is not initialized."
+        print(f"BACKEND ERROR: {error_msg}")
+        yield {"type": "token", "content": error_msg}
+        yield {"type": "done", "answer": error_msg}
+        return
+
+    if _is_search_index(vector_store_obj) and (not target_document_name or target_document_name == "All Indexed Documents"):
+        message = "Whole-document analysis works on one document at a time; choose a document under Focus Analysis."
+        yield {"type": "token", "content": message}
+        yield {"type": "done", "answer": message}
+        return
+
+    answer_parts, executor = [], None
+    with span("document_analysis", document=target_document_name or "") as analysis:
+        try:
+            chunks = get_document_chunks(vector_store_obj, target_document_name)
+            document_label = target_document_name or (chunks[0].metadata.get("source_document") if chunks else None) or "the selected document"
+            if not chunks:
+                message = f"No chunks of {document_label} were found in the search index, so it can't be analyzed as a whole."
+                QUERIES.inc(entry="analysis", outcome="no_results")
+                yield {"type": "token", "content": message}
+                yield {"type": "done", "answer": message}
+                return
+            truncated = len(chunks) > ANALYSIS_MAX_CHUNKS
+            chunks = chunks[:ANALYSIS_MAX_CHUNKS]
+            total = len(chunks)
+            prompt_version = hashlib.sha256(ANALYSIS_MAP_PROMPT.template.encode("utf-8")).hexdigest()[:16]
+            deployment = AZURE_OPENAI_CHAT_DEPLOYMENT or type(llm_client_obj).__name__
+            keys = [TextResultCache.make_key(deployment, prompt_version, hashlib.sha256(c.page_content.encode("utf-8")).hexdigest()) for c in chunks]
+
+            # --- Map ---
+            notes, pending = [None] * total, []
+            for i, key in enumerate(keys):
+                notes[i] = map_result_cache.get(key)
+                if notes[i] is None:
+                    pending.append(i)
+            cached = total - len(pending)
+            analysis.set(chunks=total, cached_chunks=cached, truncated=truncated)
+            yield {"type": "progress", "stage": "map", "done": cached, "total": total, "cached": cached,
+                   "message": f"Reading {document_label}: {cached}/{total} parts ({cached} cached)"}
+            if pending:
+                # Not a with-block: if the chat stops reading this stream, the finally below drops queued calls instead of waiting for them.
+                executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency or ANALYSIS_MAX_CONCURRENCY), thread_name_prefix="rag-analysis")
+                with span("analysis_map", chunks=len(pending)) as map_span:
+                    futures = {executor.submit(_limited_llm_call, llm_client_obj, ANALYSIS_MAP_PROMPT.format(chunk=chunks[i].page_content), map_span, "map_chunk"): i for i in pending}
+                    done = cached
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        notes[i] = future.result()
+                        map_result_cache.set(keys[i], notes[i])  # Kept even if a later chunk fails, so a retry resumes here.
+                        done += 1
+                        yield {"type": "progress", "stage": "map", "done": done, "total": total, "cached": cached,
+                               "message": f"Reading {document_label}: {done}/{total} parts ({cached} cached)"}
+
+            useful = [(i, note) for i, note in enumerate(notes) if note and note.strip().upper() != EMPTY_MAP_RESULT]
+            source_info_for_display = _sources_for_ui([chunks[i] for i, _ in useful[:5]])
+            if not useful:
+                QUERIES.inc(entry="analysis", outcome="no_results")
+                yield {"type": "sources", "sources_for_ui": []}
+                yield {"type": "token", "content": NO_RESULTS_ANSWER}
+                yield {"type": "done", "answer": NO_RESULTS_ANSWER}
+                return
+
+            # --- Reduce (hierarchical, in document order) ---
+            level_notes = [note for _, note in useful]
+            level, notes_shortened = 0, False
+            while True:
+                groups = _group_notes(level_notes, ANALYSIS_REDUCE_GROUP_TOKENS)
+                if len(groups) == 1:
+                    break
+                level += 1
+                yield {"type": "progress", "stage": "reduce", "done": 0, "total": len(groups), "cached": 0,
+                       "message": f"Combining notes (level {level}: {len(level_notes)} notes into {len(groups)})"}
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency or ANALYSIS_MAX_CONCURRENCY), thread_name_prefix="rag-analysis")
+                with span("analysis_reduce", level=level, groups=len(groups)) as reduce_span:
+                    level_notes = list(executor.map(lambda group: _limited_llm_call(
+                        llm_client_obj, ANALYSIS_COMBINE_PROMPT.format(document=document_label, notes="\n\n".join(group), question=user_query), reduce_span, "combine_notes"), groups))
+                if len(groups) == len(_group_notes(level_notes, ANALYSIS_REDUCE_GROUP_TOKENS)):
+                    # Merged notes no longer shrink; shorten each one so every part of the document stays represented.
+                    per_note_tokens = max(ANALYSIS_REDUCE_GROUP_TOKENS // len(level_notes), 1)
+                    level_notes = [truncate_to_tokens(note, per_note_tokens) for note in level_notes]
+                    notes_shortened = True
+                    analysis.set(notes_shortened=True)
+                    break
+
+            yield {"type": "sources", "sources_for_ui": source_info_for_display}
+            final_prompt = ANALYSIS_FINAL_PROMPT.format(document=document_label, notes="\n\n".join(level_notes), question=user_query)
+            with span("generation") as generation:
+                _analysis_rate_limiter.acquire()
+                for chunk in llm_client_obj.stream(final_prompt):
+                    token = _message_text(chunk)
+                    if token:
+                        answer_parts.append(token)
+                        yield {"type": "token", "content": token}
+                answer = "".join(answer_parts)
+                _record_generation_usage(generation, final_prompt, answer)
+            footnotes = ([f"Only the first {ANALYSIS_MAX_CHUNKS} parts of this document were analyzed."] if truncated else []) + \
+                        (["The notes were too long to combine in full, so each part's notes were shortened."] if notes_shortened else [])
+            if footnotes:
+                note = "".join(f"\n\n_{text}_" for text in footnotes)
+                answer += note
+                yield {"type": "token", "content": note}
+            QUERIES.inc(entry="analysis", outcome="ok")
+            yield {"type": "done", "answer": answer}
+
+        except Exception as e:
+            print(f"Error in stream_document_analysis: {e}")
+            traceback.print_exc()
+            analysis.error = f"{type(e).__name__}: {e}"
+            QUERIES.inc(entry="analysis", outcome="error")
+            error_msg = f"An error occurred in the backend while analyzing the document: {str(e)}"
+            answer = "".join(answer_parts) + ("\n\n" if answer_parts else "") + error_msg
+            yield {"type": "token", "content": ("\n\n" if answer_parts else "") + error_msg}
+            yield {"type": "done", "answer": answer}
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+# --- Uploaded Document Indexes (content-addressed, shared across sessions and workers) ---
+def hash_file_bytes(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def load_uploaded_document(file_path: str, file_name: str) -> list:
+    """Parses an uploaded PDF/DOCX into LangChain documents tagged with the upload's name.
+
+    DOCX files come back already chunked by structure (paragraphs per section, table rows with
+    their header) from docx_loader; PDFs come back one document per page.
+    """
+    if file_name.lower().endswith(".docx"):
+        return load_docx_chunks(file_path, file_name)
+    from langchain_community.document_loaders import PyPDFLoader
+    docs = PyPDFLoader(file_path).load()
+    for doc in docs:
+        doc.metadata["source_document"] = file_name
+    return docs
+
+def embed_texts_in_batches(texts: list, embeddings, batch_size: int = UPLOAD_EMBED_BATCH_SIZE, max_workers: int = UPLOAD_EMBED_MAX_WORKERS, progress_callback=None) -> list:
+    """Embeds texts with at most max_workers concurrent embed_documents calls of batch_size each, preserving order.
+    Rate-limited batches back off and retry."""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    vectors, embedded = [None] * len(batches), 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="rag-embed") as executor:
+        futures = {executor.submit(call_with_backoff, embeddings.embed_documents, batch): i for i, batch in enumerate(batches)}
+        for future in as_completed(futures):
+            i = futures[future]
+            vectors[i] = future.result()
+            embedded += len(batches[i])
+            if progress_callback: progress_callback(embedded, len(texts), f"Embedded {embedded}/{len(texts)} chunks")
+    return [vector for batch_vectors in vectors for vector in batch_vectors]
+
+def _evict_upload_indexes(keep: str = None):
+    """Removes persisted upload indexes unused for UPLOAD_INDEX_MAX_AGE_DAYS, then the least recently used
+    beyond UPLOAD_INDEX_MAX_ENTRIES. A directory's mtime is its last use; half-written .tmp directories
+    are only removed once they are an hour old."""
+    try:
+        entries = [(os.path.getmtime(path), path) for path in
+                   (os.path.join(UPLOAD_INDEX_CACHE_DIR, name) for name in os.listdir(UPLOAD_INDEX_CACHE_DIR)) if os.path.isdir(path)]
+    except OSError:
+        return
+    now = time.time()
+    stale_tmp = [path for mtime, path in entries if path.endswith(".tmp") and now - mtime > 3600]
+    indexes = sorted(((mtime, path) for mtime, path in entries if not path.endswith(".tmp") and path != keep), reverse=True)
+    max_age = UPLOAD_INDEX_MAX_AGE_DAYS * 86400
+    keep_count = max(UPLOAD_INDEX_MAX_ENTRIES - (1 if keep else 0), 0)
+    evicted = [path for i, (mtime, path) in enumerate(indexes) if i >= keep_count or (max_age and now - mtime > max_age)]
+    for path in stale_tmp + evicted:
+        shutil.rmtree(path, ignore_errors=True)
+    if evicted:
+        print(f"✅ Evicted {len(evicted)} cached upload index(es)")
+
+def build_or_load_upload_index(file_bytes: bytes, file_name: str, progress_callback=None):
+    """Returns a FAISS store for an uploaded file, reusing the persisted index when these exact bytes were seen before.
+
+    progress_callback(done, total, message) is called while a new file is being embedded.
+    The returned store carries a content_hash attribute, which the answer cache uses as its identity,
+    and a lexical_index (BM25) for hybrid retrieval. The persisted index is keyed by the file bytes,
+    the embedding deployment and UPLOAD_INDEX_VERSION, so vectors from another model or chunks from
+    an older extractor are never reused.
+    """
+    from langchain_community.vectorstores import FAISS
+    embeddings = get_embeddings_client()
+    if embeddings is None:
+        raise RuntimeError("Embedding client is not initialized.")
+    content_hash = hashlib.sha256(f"{hash_file_bytes(file_bytes)}:{embeddings.deployment_name}:{UPLOAD_INDEX_VERSION}".encode("utf-8")).hexdigest()
+    index_dir = os.path.join(UPLOAD_INDEX_CACHE_DIR, content_hash)
+
+    if os.path.isdir(index_dir):
+        try:
+            # Only indexes this process wrote itself live here, so the pickle-based docstore is trusted.
+            vector_store = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+            chunks = [vector_store.docstore.search(doc_id) for _, doc_id in sorted(vector_store.index_to_docstore_id.items())]
+            for doc in chunks:
+                doc.metadata["source_document"] = file_name
+            vector_store.content_hash = content_hash
+            vector_store.lexical_index = BM25Index(chunks)
+            os.utime(index_dir)  # Marks the index as recently used for eviction.
+            print(f"✅ Reusing cached index for '{file_name}' ({content_hash[:12]})")
+            if progress_callback: progress_callback(1, 1, "Loaded cached index")
+            return vector_store
+        except Exception as e:
+            print(f"⚠️ Cached index for '{file_name}' is unreadable, rebuilding: {e}")
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file_name)[1]) as tmp_file:
+        tmp_file.write(file_bytes); temp_file_path = tmp_file.name
+    try:
+        if progress_callback: progress_callback(0, 1, f"Parsing {file_name}")
+        docs = load_uploaded_document(temp_file_path, file_name)
+    finally:
+        if os.path.exists(temp_file_path): os.remove(temp_file_path)
+    # DOCX chunks are already sized by docx_loader; re-splitting would cut table rows away from their header.
+    splits = docs if file_name.lower().endswith(".docx") else RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(docs)
+    if not splits:
+        raise ValueError(f"No text could be extracted from '{file_name}'.")
+
+    lexical_index = BM25Index(splits)
+    texts = [doc.page_content for doc in splits]
+    vectors = embed_texts_in_batches(texts, embeddings, progress_callback=progress_callback)
+    vector_store = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=[doc.metadata for doc in splits])
+
+    # Write to a private directory and rename into place so concurrent workers never see half an index.
+    tmp_dir = f"{index_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(UPLOAD_INDEX_CACHE_DIR, exist_ok=True)
+        vector_store.save_local(tmp_dir)
+        os.replace(tmp_dir, index_dir)
+    except OSError as e:
+        print(f"⚠️ Could not persist index for '{file_name}' (another worker may have written it): {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    _evict_upload_indexes(keep=index_dir)
+    vector_store.content_hash = content_hash
+    vector_store.lexical_index = lexical_index
+    print(f"✅ Indexed '{file_name}': {len(splits)} chunks ({content_hash[:12]})")
+    return vector_store
 
 # --- Indexing and other utility functions from your original file ---
 # (Assuming these are correct and complete in your version)
 
-print("\n--- RAG Core Turbo Backend Initialization Complete ---")
\ No newline at end of file
+start_metrics_exporters()  # No-op unless METRICS_PORT or METRICS_EXPORT_PATH is set.
+
+_IMPORT_FINISHED_AT = time.perf_counter()
+print(f"\n--- RAG Core Turbo Backend Loaded in {_IMPORT_FINISHED_AT - _IMPORT_STARTED_AT:.2f}s (clients connect lazily) ---")
+
+if __name__ == "__main__":
+    # Cold-start measurement: `python rag_core_turbo.py` prints the import/probe breakdown as JSON.
+    wait_for_backend_warmup()
+    print(json.dumps(get_startup_report(), indent=2))
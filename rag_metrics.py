@@ -0,0 +1,323 @@
+# rag_metrics.py
+"""In-process tracing and metrics for the RAG path.
+
+Stages are wrapped in `span("stage")`; every finished span feeds the `rag_stage_duration_seconds`
+histogram and, on an exception, `rag_stage_errors_total`. Root spans also keep their child
+timings as a trace for the admin panel. Token, cost and query counters sit in the same registry,
+which is rendered in the Prometheus text format and can be served over HTTP (METRICS_PORT) and/or
+written to a file periodically (METRICS_EXPORT_PATH).
+"""
+
+import os
+import time
+import uuid
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH", "")
+METRICS_EXPORT_INTERVAL_SECONDS = float(os.getenv("METRICS_EXPORT_INTERVAL_SECONDS", "15"))
+RECENT_TRACES = int(os.getenv("METRICS_RECENT_TRACES", "50"))
+# One summary line per finished query on stdout (what the old DEBUG prints showed, with timings).
+TRACE_LOG = os.getenv("RAG_TRACE_LOG", "1").lower() not in ("0", "false", "no")
+# USD per 1K tokens; 0 disables the cost counters' contribution.
+LLM_PROMPT_COST_PER_1K = float(os.getenv("LLM_PROMPT_COST_PER_1K", "0"))
+LLM_COMPLETION_COST_PER_1K = float(os.getenv("LLM_COMPLETION_COST_PER_1K", "0"))
+EMBEDDING_COST_PER_1K = float(os.getenv("EMBEDDING_COST_PER_1K", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 3000, 4000, 8000, 16000)
+
+
+# --- Metric types ---
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(dict(key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects."""
+
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}  # labels -> [bucket_counts, count, sum]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += 1
+            series[2] += value
+
+    def quantile(self, q: float, bucket_counts: list, count: int) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation."""
+        if not count:
+            return 0.0
+        rank, seen = q * count, 0
+        for i, in_bucket in enumerate(bucket_counts):
+            if in_bucket and seen + in_bucket >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / in_bucket
+            seen += in_bucket
+        return self.buckets[-1]
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(dict(key), list(series[0]), series[1], series[2]) for key, series in sorted(self._series.items())]
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def histogram(self, name: str, help_text: str = "", buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def metrics(self) -> list:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_prometheus(self) -> str:
+        def fmt_labels(labels, extra=None):
+            items = list(labels.items()) + list((extra or {}).items())
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in items) + "}"
+
+        lines = []
+        for metric in self.metrics():
+            kind = "counter" if isinstance(metric, Counter) else "histogram"
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            if kind == "counter":
+                for labels, value in metric.samples():
+                    lines.append(f"{metric.name}{fmt_labels(labels)} {value}")
+                continue
+            for labels, bucket_counts, count, total in metric.samples():
+                cumulative = 0
+                for bound, in_bucket in zip(list(metric.buckets) + ["+Inf"], bucket_counts):
+                    cumulative += in_bucket
+                    lines.append(f"{metric.name}_bucket{fmt_labels(labels, {'le': bound})} {cumulative}")
+                lines.append(f"{metric.name}_count{fmt_labels(labels)} {count}")
+                lines.append(f"{metric.name}_sum{fmt_labels(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Plain-dict view for dashboards: counter values and histogram count/mean/p50/p95/p99."""
+        counters, histograms = [], []
+        for metric in self.metrics():
+            if isinstance(metric, Counter):
+                counters.extend({"name": metric.name, "labels": labels, "value": value} for labels, value in metric.samples())
+                continue
+            for labels, bucket_counts, count, total in metric.samples():
+                histograms.append({"name": metric.name, "labels": labels, "count": count,
+                                   "mean": total / count if count else 0.0,
+                                   **{f"p{int(q * 100)}": metric.quantile(q, bucket_counts, count) for q in (0.5, 0.95, 0.99)}})
+        return {"counters": counters, "histograms": histograms}
+
+
+registry = MetricsRegistry()
+STAGE_DURATION = registry.histogram("rag_stage_duration_seconds", "Wall time per RAG stage.")
+STAGE_ERRORS = registry.counter("rag_stage_errors_total", "Exceptions raised inside a RAG stage.")
+QUERIES = registry.counter("rag_queries_total", "RAG queries by entry point and outcome.")
+LLM_TOKENS = registry.counter("rag_llm_tokens_total", "LLM tokens by kind (prompt/completion).")
+EMBEDDING_TOKENS = registry.counter("rag_embedding_tokens_total", "Tokens sent to the embeddings API (estimated).")
+COST = registry.counter("rag_cost_usd_total", "Estimated spend by component, from the *_COST_PER_1K settings.")
+RATE_LIMIT_RETRIES = registry.counter("rag_rate_limit_retries_total", "Backend calls retried after a 429.")
+TIME_TO_FIRST_TOKEN = registry.histogram("rag_time_to_first_token_seconds", "Streaming queries: request start to first LLM token.")
+CONTEXT_TOKENS = registry.histogram("rag_context_tokens", "Tokens of retrieved context sent to the LLM.", buckets=TOKEN_BUCKETS)
+
+
+# --- Spans and traces ---
+class Span:
+    __slots__ = ("name", "trace_id", "parent", "attributes", "started_at", "duration_s", "error", "children")
+
+    def __init__(self, name: str, parent=None, attributes: dict = None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes or {})
+        self.started_at = time.perf_counter()
+        self.duration_s = None
+        self.error = None
+        self.children = []
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self, root_started_at: float = None) -> dict:
+        root_started_at = self.started_at if root_started_at is None else root_started_at
+        return {"name": self.name, "start_ms": round((self.started_at - root_started_at) * 1000, 3),
+                "duration_ms": round((self.duration_s or 0.0) * 1000, 3), "error": self.error,
+                "attributes": self.attributes, "children": [c.to_dict(root_started_at) for c in list(self.children)]}
+
+
+_local = threading.local()
+_traces_lock = threading.Lock()
+_recent_traces = deque(maxlen=RECENT_TRACES)
+
+
+def current_span():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name: str, parent=None, **attributes):
+    """Times a stage. Nested spans on the same thread attach to the enclosing one; pass parent=
+    explicitly (from current_span()) when the work runs on another thread."""
+    parent = parent if parent is not None else current_span()
+    active = Span(name, parent, attributes)
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(active)
+    try:
+        yield active
+    except GeneratorExit:
+        raise  # The consumer stopped reading a stream; not a stage failure.
+    except BaseException as e:
+        active.error = f"{type(e).__name__}: {e}"
+        STAGE_ERRORS.inc(stage=name, error_type=type(e).__name__)
+        raise
+    finally:
+        active.duration_s = time.perf_counter() - active.started_at
+        if stack and stack[-1] is active:
+            stack.pop()
+        elif active in stack:
+            stack.remove(active)  # A generator span closed out of order (e.g. an abandoned stream).
+        STAGE_DURATION.observe(active.duration_s, stage=name)
+        if parent is not None:
+            parent.children.append(active)
+        else:
+            _finish_trace(active)
+
+
+def _finish_trace(root: Span):
+    trace = {"trace_id": root.trace_id, "finished_at": time.time(), **root.to_dict()}
+    with _traces_lock:
+        _recent_traces.append(trace)
+    if TRACE_LOG:
+        stages = ", ".join(f"{c['name']} {c['duration_ms']:.0f}ms" for c in trace["children"])
+        print(f"TRACE {root.trace_id} {root.name} {trace['duration_ms']:.0f}ms" + (f" [{stages}]" if stages else "")
+              + (f" ERROR {root.error}" if root.error else ""))
+
+
+def recent_traces(limit: int = None) -> list:
+    """Most recent finished root spans, newest first."""
+    with _traces_lock:
+        traces = list(_recent_traces)
+    traces.reverse()
+    return traces[:limit] if limit else traces
+
+
+# --- Convenience recorders ---
+def record_llm_tokens(prompt_tokens: int, completion_tokens: int, deployment: str = ""):
+    LLM_TOKENS.inc(prompt_tokens, kind="prompt", deployment=deployment)
+    LLM_TOKENS.inc(completion_tokens, kind="completion", deployment=deployment)
+    cost = prompt_tokens / 1000 * LLM_PROMPT_COST_PER_1K + completion_tokens / 1000 * LLM_COMPLETION_COST_PER_1K
+    if cost:
+        COST.inc(cost, component="llm")
+
+
+def record_embedding_tokens(tokens: int, deployment: str = ""):
+    EMBEDDING_TOKENS.inc(tokens, deployment=deployment)
+    if EMBEDDING_COST_PER_1K:
+        COST.inc(tokens / 1000 * EMBEDDING_COST_PER_1K, component="embeddings")
+
+
+# --- Exporters ---
+def write_metrics_file(path: str = None) -> str:
+    """Writes the Prometheus text exposition atomically (node_exporter textfile-collector compatible)."""
+    path = path or METRICS_EXPORT_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(registry.render_prometheus())
+    os.replace(tmp_path, path)
+    return path
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console.
+
+
+_exporters_lock = threading.Lock()
+_exporters_started = False
+
+
+def start_metrics_exporters(port: int = None, export_path: str = None, interval_s: float = None):
+    """Starts the HTTP /metrics endpoint and/or the periodic file writer once per process (both opt-in)."""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    port = METRICS_PORT if port is None else port
+    export_path = export_path or METRICS_EXPORT_PATH
+    interval_s = interval_s or METRICS_EXPORT_INTERVAL_SECONDS
+    if port:
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="rag-metrics-http", daemon=True).start()
+            print(f"✅ Metrics endpoint listening on :{port}/metrics")
+        except OSError as e:
+            # Another Streamlit worker on this host already owns the port.
+            print(f"⚠️ Metrics endpoint not started on port {port}: {e}")
+    if export_path:
+        def export_loop():
+            while True:
+                time.sleep(interval_s)
+                try:
+                    write_metrics_file(export_path)
+                except Exception as e:
+                    print(f"⚠️ Metrics file export to '{export_path}' failed: {e}")
+        threading.Thread(target=export_loop, name="rag-metrics-file", daemon=True).start()
+        print(f"✅ Writing metrics to '{export_path}' every {interval_s:.0f}s")